@@ -0,0 +1,271 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import flet as ft
+from flet.core.connection import Connection
+from flet.core.protocol import CommandEncoder, PageCommandResponsePayload, PageCommandsBatchResponsePayload
+
+from board import Board
+from jsonstore import JSONStore
+import render
+import workspace
+from store_bench import summarize, timed
+
+# Benchmark da construção e dos handlers da UI sem janela: usa um ft.Page
+# verdadeiro ligado a uma HeadlessConnection, que responde aos comandos como o
+# cliente Flet. Assim o diff da árvore e a serialização dos comandos são os
+# reais, e o que seria enviado pela rede fica contado.
+
+SCENARIOS = ["build", "mount", "apply_filters", "drag_hover", "drag_accept", "theme_toggle"]
+
+
+class HeadlessConnection(Connection):
+    def __init__(self):
+        super().__init__()
+        self.next_id = 1
+        self.batches = 0
+        self.commands = 0
+        self.bytes_sent = 0
+
+    def send_command(self, session_id: str, command):
+        self.send_commands(session_id, [command])
+        return PageCommandResponsePayload(result="", error="")
+
+    def send_commands(self, session_id: str, commands):
+        self.batches += 1
+        self.commands += len(commands)
+        self.bytes_sent += len(json.dumps(commands, cls=CommandEncoder, separators=(",", ":")))
+        # O cliente responde com os ids dos controlos de cada "add"
+        results = []
+        for command in commands:
+            if command.name == "add":
+                ids = range(self.next_id, self.next_id + len(command.commands))
+                self.next_id += len(command.commands)
+                results.append(" ".join(f"_{i}" for i in ids))
+        return PageCommandsBatchResponsePayload(results=results, error="")
+
+    def reset_counters(self):
+        self.batches = self.commands = self.bytes_sent = 0
+
+
+def headless_page(width=1280, height=800) -> ft.Page:
+    page = ft.Page(HeadlessConnection(), "headless", asyncio.new_event_loop())
+    # No cliente real estes atributos chegam pelo evento de resize
+    page._set_attr("width", width)
+    page._set_attr("height", height)
+    page.theme_mode = ft.ThemeMode.LIGHT
+    return page
+
+
+def headless_app(page: ft.Page):
+    # O Board só usa app.page
+    return SimpleNamespace(page=page)
+
+
+def open_store(directory: str, data: dict, user: str):
+    # write-behind para que as escritas em disco não entrem nos tempos da UI
+    filename = os.path.join(directory, "data.json")
+    workspace.write(data, filename)
+    store = JSONStore(filename, write_behind=True)
+    store.set_current_user(store.get_user(user))
+    return store
+
+
+def build_board(page: ft.Page, store, board_id: int) -> Board:
+    summary = store.get_board_summary(board_id)
+    return Board(headless_app(page), store, summary.name, page, board_id=board_id)
+
+
+def count_controls(control: ft.Control) -> int:
+    return 1 + sum(count_controls(child) for child in control._get_children())
+
+
+def board_lists(board: Board):
+    return board.board_lists.controls[:-1]
+
+
+def drag_event(page: ft.Page, src: ft.Control, target: ft.Control, data="true"):
+    # Evento de DragTarget: o src_id é o uid do Draggable de origem
+    return SimpleNamespace(src_id=src.uid, control=target, data=data, page=page)
+
+
+def filter_combinations(board_list) -> list[tuple]:
+    tags = sorted(board_list.get_all_tags())[:2]
+    return [
+        ("Alta", "Todas", []),
+        ("Todas", "Concluídas", []),
+        ("Baixa", "Não Concluídas", []),
+        ("Todas", "Todas", tags[:1]),
+        ("Média", "Todas", tags),
+        ("Todas", "Todas", []),
+    ]
+
+
+def run_scenarios(data: dict, user: str, board_id: int, repeat: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    samples = {name: [] for name in SCENARIOS}
+    sent = {name: {"batches": 0, "commands": 0, "bytes": 0} for name in SCENARIOS}
+    controls = {}
+
+    def measure(name, page, fn, *args):
+        conn = page._Page__conn
+        conn.reset_counters()
+        elapsed = timed(fn, *args)
+        # As invalidações dos handlers são enviadas já, como no fim do frame
+        start = time.perf_counter()
+        render.flush(page)
+        samples[name].append(elapsed + time.perf_counter() - start)
+        sent[name]["batches"] += conn.batches
+        sent[name]["commands"] += conn.commands
+        sent[name]["bytes"] += conn.bytes_sent
+
+    for _ in range(repeat):
+        directory = tempfile.mkdtemp(prefix="trolli-headless-")
+        try:
+            store = open_store(directory, data, user)
+            page = headless_page()
+            start = time.perf_counter()
+            board = build_board(page, store, board_id)
+            samples["build"].append(time.perf_counter() - start)
+            controls["board"] = count_controls(board)
+
+            measure("mount", page, page.add, board)
+            controls["mounted"] = len(page.index)
+
+            for board_list in board_lists(board):
+                for priority, status, tags in filter_combinations(board_list):
+                    board_list.priority_filter.value = priority
+                    board_list.status_filter.value = status
+                    board_list.selected_tags = tags
+                    measure("apply_filters", page, board_list.apply_filters, None)
+
+            items = [item for board_list in board_lists(board) for item in board_list.get_items()]
+            for _ in range(min(50, len(items))):
+                src, target = rng.sample(items, 2)
+                measure("drag_hover", page, target.drag_will_accept, drag_event(page, src.view, target.view.content))
+                measure("drag_hover", page, target.drag_leave, drag_event(page, src.view, target.view.content, "false"))
+
+            # Mover cartões entre listas (a árvore muda a cada movimento)
+            for _ in range(min(20, len(items))):
+                lists = [l for l in board_lists(board) if l.get_items()]
+                if len(lists) < 2:
+                    break
+                src_list, target_list = rng.sample(lists, 2)
+                src = rng.choice(src_list.get_items())
+                target = rng.choice(target_list.get_items())
+                measure("drag_accept", page, target.drag_accept, drag_event(page, src.view, target.view.content))
+
+            def toggle_theme():
+                page.theme_mode = ft.ThemeMode.DARK if page.theme_mode == ft.ThemeMode.LIGHT else ft.ThemeMode.LIGHT
+                for board_list in board_lists(board):
+                    board_list.update_theme()
+                page.update()
+
+            for _ in range(4):
+                measure("theme_toggle", page, toggle_theme)
+            store.close()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    results = {}
+    for name in SCENARIOS:
+        results[name] = summarize(samples[name])
+        if "n" in results[name]:
+            results[name]["sent"] = sent[name]
+    results["controls"] = controls
+    return results
+
+
+def measure_allocations(data: dict, user: str, board_id: int) -> dict:
+    # Passagem separada: o tracemalloc abranda muito a execução
+    directory = tempfile.mkdtemp(prefix="trolli-headless-")
+    try:
+        store = open_store(directory, data, user)
+        page = headless_page()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            board = build_board(page, store, board_id)
+            built, peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            page.add(board)
+            mounted, mount_peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        store.close()
+        controls = count_controls(board)
+        return {
+            "build_bytes": built - before,
+            "build_peak_bytes": peak - before,
+            "mount_bytes": mounted - built,
+            "mount_peak_bytes": mount_peak - built,
+            "bytes_per_control": (mounted - before) / controls,
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def print_report(results: dict, allocations: dict):
+    print(f"{'cenário':<14} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'comandos':>9} {'bytes':>10}")
+    for name in SCENARIOS:
+        r = results[name]
+        if "skipped" in r:
+            print(f"{name:<14} {'-':>5} {r['skipped']}")
+            continue
+        sent = r.get("sent", {"commands": 0, "bytes": 0})
+        print(f"{name:<14} {r['n']:>5} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {sent['commands']:>9} {sent['bytes']:>10}")
+    print(f"Controlos no board: {results['controls']['board']} ({results['controls']['mounted']} montados na página)")
+    print(f"Memória: build {allocations['build_bytes'] / 1024:.0f} KiB, mount {allocations['mount_bytes'] / 1024:.0f} KiB "
+          f"({allocations['bytes_per_control']:.0f} bytes por controlo)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark headless da UI do Trolli")
+    parser.add_argument("--lists", type=int, default=6, help="listas no board")
+    parser.add_argument("--cards", type=int, default=40, help="cartões por lista")
+    parser.add_argument("--tags", type=int, default=3, help="máximo de tags por cartão")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="ficheiro JSON de resultados (por omissão benchmarks/results/)")
+    args = parser.parse_args()
+
+    data = workspace.generate(1, 1, args.lists, args.cards, args.tags, args.seed)
+    user = data["users"][1]["name"]
+    board_id = data["users"][1]["boards"][0]["id"]
+    results = run_scenarios(data, user, board_id, args.repeat, args.seed)
+    allocations = measure_allocations(data, user, board_id)
+
+    created = datetime.now()
+    report = {
+        "created": created.isoformat(timespec="seconds"),
+        "flet": ft.version.version,
+        "board": {"lists": args.lists, "cards": args.cards, "tags": args.tags, "seed": args.seed},
+        "repeat": args.repeat,
+        "scenarios": results,
+        "allocations": allocations,
+    }
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "results", f"headless-{created:%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=4)
+
+    print_report(results, allocations)
+    print(f"Resultados gravados em {output}")
+
+
+if __name__ == "__main__":
+    main()
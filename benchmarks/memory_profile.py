@@ -0,0 +1,289 @@
+import argparse
+import enum
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+import types
+from collections import deque
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import flet as ft
+
+from headless import board_lists, build_board, count_controls, headless_page
+from jsonstore import JSONStore
+import snapshot
+import tagging
+import workspace
+from store_bench import percentile
+
+# Perfil de memória de um workspace: constrói os boards de um utilizador pelo
+# caminho normal (Board -> BoardList -> Item) numa página headless e atribui
+# a memória a cada board, lista e cartão. Os totais por board vêm do
+# tracemalloc; a divisão por lista e cartão vem de percorrer os objetos
+# alcançáveis a partir de cada controlo (SizeWalker). Os dados que os
+# controlos partilham com o store (strings, listas de tags) contam no store.
+
+DEFAULT_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "data.json")
+
+
+class SizeWalker:
+    # Soma sys.getsizeof dos objetos alcançáveis a partir de uma raiz, cada
+    # objeto uma única vez por walker. Não atravessa as fronteiras (página,
+    # store, outros boards e listas), o parent dos controlos, enums, classes
+    # nem módulos: o que é partilhado fica com quem o alcançou primeiro.
+    def __init__(self, boundaries=(), exclude=()):
+        self.boundaries = {id(b) for b in boundaries}
+        self.seen = set(exclude)
+
+    def size(self, root) -> int:
+        total = 0
+        stack = [root]
+        while stack:
+            obj = stack.pop()
+            if id(obj) in self.seen or (obj is not root and id(obj) in self.boundaries):
+                continue
+            if isinstance(obj, (type, types.ModuleType, enum.Enum, types.BuiltinFunctionType)):
+                continue
+            self.seen.add(id(obj))
+            total += sys.getsizeof(obj)
+            if isinstance(obj, (str, bytes, int, float, bool, types.MethodType)) or obj is None:
+                continue
+            if isinstance(obj, dict):
+                stack.extend(obj.keys())
+                stack.extend(obj.values())
+            elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+                stack.extend(obj)
+            elif isinstance(obj, types.FunctionType):
+                # Os handlers de evento do Flet são closures
+                stack.extend(cell.cell_contents for cell in obj.__closure__ or () if _has_contents(cell))
+            else:
+                attrs = getattr(obj, "__dict__", None)
+                if attrs is not None:
+                    self.seen.add(id(attrs))
+                    total += sys.getsizeof(attrs)
+                    stack.extend(v for k, v in attrs.items() if k != "parent")
+                for name in getattr(type(obj), "__slots__", ()):
+                    if hasattr(obj, name):
+                        stack.append(getattr(obj, name))
+        return total
+
+
+def _has_contents(cell) -> bool:
+    try:
+        cell.cell_contents
+    except ValueError:
+        return False
+    return True
+
+
+def data_ids(obj) -> set[int]:
+    # ids de todos os objetos de um valor do store (dicts, listas, strings)
+    walker = SizeWalker()
+    walker.size(obj)
+    return walker.seen
+
+
+def rss_bytes() -> int | None:
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def open_workspace(directory: str, source: str | None, generate: list[int] | None):
+    filename = os.path.join(directory, "data.json")
+    if generate:
+        workspace.write(workspace.generate(*generate), filename)
+    else:
+        # Trabalha sobre uma cópia: o JSONStore pode regravar o ficheiro
+        snapshot.convert(source, filename, "json")
+    return JSONStore(filename)
+
+
+def card_stats(cards: list[dict]) -> dict:
+    if not cards:
+        return {"count": 0}
+    sizes = [c["bytes"] for c in cards]
+    return {
+        "count": len(cards),
+        "bytes": sum(sizes),
+        "p50_bytes": percentile(sizes, 0.50),
+        "p95_bytes": percentile(sizes, 0.95),
+        "max_bytes": max(sizes),
+        "controls_per_card": sum(c["controls"] for c in cards) / len(cards),
+    }
+
+
+def profile_board(store, board_id: int) -> tuple[dict, list[dict]]:
+    page = headless_page()
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    board = build_board(page, store, board_id)
+    built = tracemalloc.get_traced_memory()[0]
+    page.add(board)
+    mounted = tracemalloc.get_traced_memory()[0]
+
+    lists = board_lists(board)
+    walker = SizeWalker(
+        boundaries=[page, store, board.app, board, *lists],
+        exclude=data_ids(store.get_lists_by_board(board_id)),
+    )
+    list_reports, cards = [], []
+    for board_list in lists:
+        list_cards = []
+        for wrapper in board_list.items.controls:
+            item = wrapper.controls[1]
+            list_cards.append({
+                "item_id": item.item_id,
+                "item_text": item.item_text,
+                "list_id": board_list.board_list_id,
+                "bytes": walker.size(wrapper),
+                "controls": count_controls(wrapper),
+            })
+        overhead = walker.size(board_list)
+        list_reports.append({
+            "list_id": board_list.board_list_id,
+            "title": board_list.title,
+            "virtualized": board_list.virtualized,
+            "pending_cards": len(board_list.pending_items),
+            "controls": count_controls(board_list),
+            "bytes": overhead + sum(c["bytes"] for c in list_cards),
+            "list_bytes": overhead,
+            "cards": card_stats(list_cards),
+        })
+        cards.extend(list_cards)
+    report = {
+        "board_id": board_id,
+        "name": board.name,
+        "controls": count_controls(board),
+        "build_bytes": built - before,
+        "mount_bytes": mounted - built,
+        "walk_bytes": walker.size(board) + sum(l["bytes"] for l in list_reports),
+        "store_bytes": SizeWalker().size(store.get_lists_by_board(board_id)),
+        "lists": list_reports,
+        "cards": card_stats(cards),
+    }
+    page.remove(board)
+    return report, cards
+
+
+def profile_models() -> dict:
+    # Custo residente de cada modelo spaCy carregado pelo Item (via tagging)
+    models = {}
+    for lang, name in tagging.MODELS.items():
+        gc.collect()
+        traced, rss = tracemalloc.get_traced_memory()[0], rss_bytes()
+        nlp = tagging.load_model(lang)
+        if nlp is None:
+            models[name] = {"available": False}
+            continue
+        gc.collect()
+        models[name] = {
+            "available": True,
+            "version": nlp.meta.get("version", ""),
+            "traced_bytes": tracemalloc.get_traced_memory()[0] - traced,
+            "rss_bytes": rss_bytes() - rss if rss is not None else None,
+        }
+    return models
+
+
+def kib(value) -> str:
+    return f"{value / 1024:,.0f} KiB" if value is not None else "-"
+
+
+def print_report(report: dict, top: list[dict]):
+    print(f"Utilizador: {report['user']}  RSS: {kib(report['rss_before'])} -> {kib(report['rss_after'])}")
+    print(f"{'board/lista':<32} {'controlos':>10} {'cartões':>8} {'build':>12} {'mount':>10} {'walk':>12} {'store':>10} {'p95 cartão':>11}")
+    for b in report["boards"]:
+        cards = b["cards"]
+        print(f"{b['name'][:32]:<32} {b['controls']:>10} {cards['count']:>8} {kib(b['build_bytes']):>12} "
+              f"{kib(b['mount_bytes']):>10} {kib(b['walk_bytes']):>12} {kib(b['store_bytes']):>10} "
+              f"{cards.get('p95_bytes', 0):>9} B")
+        for l in b["lists"]:
+            pending = f" (+{l['pending_cards']} por materializar)" if l["pending_cards"] else ""
+            print(f"  {l['title'][:30]:<30} {l['controls']:>10} {l['cards']['count']:>8} {'':>12} {'':>10} "
+                  f"{kib(l['bytes']):>12} {'':>10} {l['cards'].get('p95_bytes', 0):>9} B{pending}")
+    if top:
+        print("Cartões maiores:")
+        for c in top:
+            print(f"  #{c['item_id']:<6} {c['bytes']:>8} B {c['controls']:>4} controlos  {c['item_text'][:50]}")
+    for name, model in report["models"].items():
+        if not model.get("available", True):
+            print(f"Modelo {name}: indisponível")
+        elif "skipped" in model:
+            print(f"Modelo {name}: {model['skipped']}")
+        else:
+            print(f"Modelo {name} {model['version']}: tracemalloc {kib(model['traced_bytes'])}, RSS {kib(model['rss_bytes'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil de memória por board, lista e cartão")
+    parser.add_argument("--data", default=DEFAULT_DATA, help="data.json ou snapshot binário (é usada uma cópia)")
+    parser.add_argument("--generate", type=int, nargs=5, metavar=("USERS", "BOARDS", "LISTS", "CARDS", "TAGS"),
+                        help="usa um workspace sintético em vez de --data")
+    parser.add_argument("--user", help="por omissão o primeiro utilizador com boards")
+    parser.add_argument("--top", type=int, default=10, help="cartões maiores a listar")
+    parser.add_argument("--skip-models", action="store_true", help="não carrega os modelos spaCy")
+    parser.add_argument("--output", help="ficheiro JSON de resultados (por omissão benchmarks/results/)")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="trolli-memory-")
+    try:
+        store = open_workspace(directory, args.data, args.generate)
+        user = store.get_user(args.user) if args.user else next(
+            (u for u in store.get_users() if store.get_board_count(u["name"])), None
+        )
+        if user is None:
+            sys.exit(f"Utilizador sem boards ou inexistente: {args.user or '(nenhum com boards)'}")
+        store.set_current_user(user)
+
+        rss_before = rss_bytes()
+        tracemalloc.start()
+        boards, cards = [], []
+        for summary in store.get_board_summaries():
+            board_report, board_cards = profile_board(store, summary.board_id)
+            boards.append(board_report)
+            cards.extend(board_cards)
+        if args.skip_models:
+            models = {name: {"skipped": "--skip-models"} for name in tagging.MODELS.values()}
+        else:
+            models = profile_models()
+        tracemalloc.stop()
+        store.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    created = datetime.now()
+    report = {
+        "created": created.isoformat(timespec="seconds"),
+        "flet": ft.version.version,
+        "source": "generate" if args.generate else os.path.abspath(args.data),
+        "user": user["name"],
+        "rss_before": rss_before,
+        "rss_after": rss_bytes(),
+        "boards": boards,
+        "cards": card_stats(cards),
+        "models": models,
+    }
+    top = sorted(cards, key=lambda c: c["bytes"], reverse=True)[:args.top]
+    report["top_cards"] = top
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "results", f"memory-{created:%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=4, ensure_ascii=False)
+
+    print_report(report, top)
+    print(f"Resultados gravados em {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from jsonstore import JSONStore
+from memory_store import InMemoryStore
+from search_index import _field
+from sharded_store import ShardedJSONStore
+from sqlite_store import SQLiteStore
+import snapshot
+import workspace
+
+# Benchmark da camada de armazenamento: gera um workspace sintético, abre-o
+# com cada implementação de DataStore e mede cada cenário operação a operação.
+# Sem Flet: os modelos passados ao store são SimpleNamespace com os mesmos
+# atributos que Board, BoardList e Item.
+
+SCENARIOS = ["load", "login", "add_item", "edit_item", "toggle_item", "remove_item", "remove_list", "save"]
+
+
+class Variant:
+    # prepare() cria os ficheiros uma vez; open() abre o store (é o que o
+    # cenário "load" mede)
+    def __init__(self, name: str, prepare, open):
+        self.name = name
+        self.prepare = prepare
+        self.open = open
+
+
+def copy_source(workdir: str, source: str):
+    shutil.copy(source, os.path.join(workdir, "data.json"))
+
+
+def json_variant(name: str, **kwargs) -> Variant:
+    return Variant(name, copy_source, lambda workdir: JSONStore(os.path.join(workdir, "data.json"), **kwargs))
+
+
+def prepare_binary(workdir: str, source: str):
+    snapshot.convert(source, os.path.join(workdir, "data.snapshot"), "binary")
+
+
+def prepare_sharded(workdir: str, source: str):
+    ShardedJSONStore(os.path.join(workdir, "data"), import_from=source).close()
+
+
+def prepare_sqlite(workdir: str, source: str):
+    SQLiteStore(os.path.join(workdir, "data.db"), import_from=source).close()
+
+
+def open_memory(workdir: str):
+    # O InMemoryStore não lê ficheiros: "load" é ler o JSON e inseri-lo pela API
+    store = InMemoryStore()
+    data = snapshot.load(os.path.join(workdir, "data.json"))
+    for user in data["users"]:
+        store.add_user(SimpleNamespace(name=user["name"], password=user["password"]))
+        for board in user["boards"]:
+            store.add_board(SimpleNamespace(board_id=board["id"], name=board["name"]))
+            for board_list in board["lists"]:
+                store.add_list(board["id"], SimpleNamespace(
+                    board_list_id=board_list["id"], title=board_list["title"], color=board_list["color"]
+                ))
+                for item in board_list["items"]:
+                    store.add_item(board_list["id"], SimpleNamespace(
+                        item_id=item["id"],
+                        item_text=item["item_text"],
+                        priority=item["priority"],
+                        description=item["description"],
+                        tags=item["tags"],
+                        completed=item["completed"],
+                    ))
+    return store
+
+
+VARIANTS = {
+    "json": json_variant("json"),
+    "json-journal": json_variant("json-journal", journal=True),
+    "json-write-behind": json_variant("json-write-behind", write_behind=True),
+    "json-binary": Variant(
+        "json-binary",
+        prepare_binary,
+        lambda workdir: JSONStore(os.path.join(workdir, "data.snapshot"), snapshot_format="binary"),
+    ),
+    "sharded": Variant("sharded", prepare_sharded, lambda workdir: ShardedJSONStore(os.path.join(workdir, "data"))),
+    "sqlite": Variant("sqlite", prepare_sqlite, lambda workdir: SQLiteStore(os.path.join(workdir, "data.db"))),
+    "memory": Variant("memory", copy_source, open_memory),
+}
+
+
+def percentile(samples: list[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(p * (len(ordered) - 1)))]
+
+
+def summarize(samples: list[float]) -> dict:
+    if not samples:
+        return {"skipped": "sem amostras"}
+    total = sum(samples)
+    return {
+        "n": len(samples),
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "mean_ms": total / len(samples) * 1000,
+        "ops_per_s": len(samples) / total if total else None,
+    }
+
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def new_item(store, rng: random.Random):
+    return SimpleNamespace(
+        item_id=store.allocate_id("item"),
+        item_text=" ".join(rng.choice(workspace.WORDS) for _ in range(3)).capitalize(),
+        priority=rng.choice(workspace.PRIORITIES),
+        description=" ".join(rng.choice(workspace.WORDS) for _ in range(8)),
+        tags=rng.sample(workspace.TAGS, 2),
+        completed=False,
+    )
+
+
+def collect(store):
+    # (board_id, list_id) de todas as listas e (list_id, item_id, completed)
+    # de todos os cartões visíveis para o utilizador atual
+    lists, items = [], []
+    for summary in store.get_board_summaries():
+        for board_list in store.get_lists_by_board(summary.board_id):
+            list_id = _field(board_list, "id", "board_list_id")
+            lists.append((summary.board_id, list_id))
+            for item in store.get_items(list_id):
+                items.append([list_id, _field(item, "id", "item_id"), _field(item, "completed", "completed")])
+    return lists, items
+
+
+def check_round_trip(variant: Variant, workdir: str, user: str) -> dict:
+    # Lista e cartão criados na mesma transação e o cartão editado a seguir:
+    # depois de reabrir (replay do journal, nos stores que o têm) a lista tem
+    # de ter exatamente esse cartão, com o texto editado
+    store = variant.open(workdir)
+    if not hasattr(store, "set_current_user"):
+        store.close()
+        return {"skipped": "store sem persistência"}
+    store.set_current_user(store.get_user(user))
+    board_id = store.get_board_summaries()[0].board_id
+    board_list = SimpleNamespace(board_list_id=store.allocate_id("list"), title="Round trip", color=workspace.COLORS[0])
+    item = new_item(store, random.Random(0))
+    with store.transaction():
+        store.add_list(board_id, board_list)
+        store.add_item(board_list.board_list_id, item)
+    store.update_item(board_list.board_list_id, item.item_id, {"item_text": "Round trip"})
+    store.close()
+
+    store = variant.open(workdir)
+    store.set_current_user(store.get_user(user))
+    found = [(_field(i, "id", "item_id"), _field(i, "item_text", "item_text"))
+             for i in store.get_items(board_list.board_list_id)]
+    store.close()
+    expected = [(item.item_id, "Round trip")]
+    return {"ok": found == expected, "expected": expected, "found": found}
+
+
+def run_variant(variant: Variant, source: str, users: list[str], ops: int, repeat: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    results = {}
+    workdir = tempfile.mkdtemp(prefix=f"trolli-bench-{variant.name}-")
+    try:
+        variant.prepare(workdir, source)
+
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            store = variant.open(workdir)
+            samples.append(time.perf_counter() - start)
+            store.close()
+        results["load"] = summarize(samples)
+
+        store = variant.open(workdir)
+        if hasattr(store, "set_current_user"):
+            # Uma amostra por utilizador; no sharded inclui ler o shard dele
+            samples = []
+            for name in users:
+                start = time.perf_counter()
+                store.set_current_user(store.get_user(name))
+                store.get_board_summaries()
+                samples.append(time.perf_counter() - start)
+            results["login"] = summarize(samples)
+            store.set_current_user(store.get_user(users[0]))
+        else:
+            results["login"] = {"skipped": "store sem utilizadores"}
+
+        lists, items = collect(store)
+
+        samples = []
+        for _ in range(ops):
+            board_id, list_id = rng.choice(lists)
+            item = new_item(store, rng)
+            samples.append(timed(store.add_item, list_id, item))
+            items.append([list_id, item.item_id, False])
+        results["add_item"] = summarize(samples)
+
+        samples = []
+        for _ in range(ops):
+            list_id, item_id, _ = rng.choice(items)
+            fields = {"item_text": f"Editado {rng.random():.6f}", "priority": rng.choice(workspace.PRIORITIES)}
+            samples.append(timed(store.update_item, list_id, item_id, fields))
+        results["edit_item"] = summarize(samples)
+
+        samples = []
+        for _ in range(ops):
+            entry = rng.choice(items)
+            entry[2] = not entry[2]
+            samples.append(timed(store.update_item, entry[0], entry[1], {"completed": entry[2]}))
+        results["toggle_item"] = summarize(samples)
+
+        samples = []
+        for list_id, item_id, _ in rng.sample(items, min(ops, len(items))):
+            samples.append(timed(store.remove_item, list_id, item_id))
+        results["remove_item"] = summarize(samples)
+
+        samples = []
+        for board_id, list_id in rng.sample(lists, min(ops, len(lists))):
+            samples.append(timed(store.remove_list, board_id, list_id))
+        results["remove_list"] = summarize(samples)
+
+        # Gravação completa do snapshot (só nos stores que o reescrevem)
+        if hasattr(store, "compact"):
+            results["save"] = summarize([timed(store.compact) for _ in range(repeat)])
+        else:
+            results["save"] = {"skipped": "sem snapshot (escritas por operação)"}
+        store.close()
+        results["round_trip"] = check_round_trip(variant, workdir, users[0])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def print_table(stores: dict):
+    print(f"{'store':<18} {'cenário':<12} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'ops/s':>10}")
+    for name, results in stores.items():
+        for scenario in SCENARIOS:
+            r = results[scenario]
+            if "skipped" in r:
+                print(f"{name:<18} {scenario:<12} {'-':>5} {r['skipped']}")
+            else:
+                print(f"{name:<18} {scenario:<12} {r['n']:>5} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['ops_per_s']:>10.1f}")
+        check = results["round_trip"]
+        if "skipped" in check:
+            print(f"{name:<18} {'round_trip':<12} {'-':>5} {check['skipped']}")
+        else:
+            print(f"{name:<18} {'round_trip':<12} {'ok' if check['ok'] else 'FALHOU: ' + str(check['found'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos stores do Trolli")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--boards", type=int, default=4, help="boards por utilizador")
+    parser.add_argument("--lists", type=int, default=5, help="listas por board")
+    parser.add_argument("--cards", type=int, default=50, help="cartões por lista")
+    parser.add_argument("--tags", type=int, default=3, help="máximo de tags por cartão")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--ops", type=int, default=100, help="operações por cenário de mutação")
+    parser.add_argument("--repeat", type=int, default=5, help="repetições de load e save")
+    parser.add_argument("--stores", default=",".join(VARIANTS), help="lista separada por vírgulas")
+    parser.add_argument("--output", help="ficheiro JSON de resultados (por omissão benchmarks/results/)")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.stores.split(",") if n.strip()]
+    unknown = [n for n in names if n not in VARIANTS]
+    if unknown:
+        parser.error(f"Stores desconhecidos: {', '.join(unknown)} (use {', '.join(VARIANTS)})")
+
+    data = workspace.generate(args.users, args.boards, args.lists, args.cards, args.tags, args.seed)
+    users = [u["name"] for u in data["users"] if u["name"] != "admin"] or ["admin"]
+    stores = {}
+    with tempfile.TemporaryDirectory(prefix="trolli-bench-") as tmp:
+        source = os.path.join(tmp, "data.json")
+        workspace.write(data, source)
+        source_bytes = os.path.getsize(source)
+        for name in names:
+            print(f"A medir {name}...", file=sys.stderr)
+            stores[name] = run_variant(VARIANTS[name], source, users, args.ops, args.repeat, args.seed)
+
+    created = datetime.now()
+    report = {
+        "created": created.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "workspace": {
+            "users": args.users,
+            "boards": args.boards,
+            "lists": args.lists,
+            "cards": args.cards,
+            "tags": args.tags,
+            "seed": args.seed,
+            "total_cards": args.users * args.boards * args.lists * args.cards,
+            "bytes": source_bytes,
+        },
+        "ops": args.ops,
+        "repeat": args.repeat,
+        "stores": stores,
+    }
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "results", f"store-{created:%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=4)
+
+    print_table(stores)
+    print(f"Resultados gravados em {output}")
+    failed = [name for name, results in stores.items() if results["round_trip"].get("ok") is False]
+    if failed:
+        sys.exit(f"Dados diferentes depois de reabrir: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import json
+import random
+
+# Gerador determinístico de workspaces sintéticos no formato do data.json:
+# a mesma semente e os mesmos tamanhos dão sempre o mesmo ficheiro, para que
+# os resultados de execuções diferentes sejam comparáveis.
+
+WORDS = [
+    "rever", "relatório", "reunião", "cliente", "entrega", "projeto", "testes", "corrigir",
+    "erro", "login", "página", "design", "orçamento", "contrato", "escola", "trabalho",
+    "apresentação", "ação", "migração", "dados", "servidor", "backup", "documentação", "equipa",
+    "planeamento", "sprint", "fatura", "email", "marketing", "campanha", "inventário", "compras",
+]
+TAGS = [
+    "urgente", "escola", "trabalho", "casa", "bug", "ideia", "cliente", "financeiro",
+    "pessoal", "saúde", "viagem", "leitura", "revisão", "bloqueado", "backend", "frontend",
+]
+PRIORITIES = ["Baixa", "Média", "Alta"]
+COLORS = ["#FFF59D", "#A5D6A7", "#90CAF9", "#FFAB91", "#CE93D8"]
+
+
+def generate(users=5, boards=4, lists=5, cards=50, tags=3, seed=1) -> dict:
+    # users × boards × lists × cards; cada cartão tem até `tags` tags
+    rng = random.Random(seed)
+    next_ids = {"board": 1, "list": 1, "item": 1}
+
+    def new_id(kind):
+        id = next_ids[kind]
+        next_ids[kind] = id + 1
+        return id
+
+    def sentence(n):
+        return " ".join(rng.choice(WORDS) for _ in range(n))
+
+    data = {"users": [{"name": "admin", "password": "admin", "boards": []}]}
+    for u in range(users):
+        user = {"name": f"user{u}", "password": f"pass{u}", "boards": []}
+        for _ in range(boards):
+            board = {"id": new_id("board"), "name": sentence(2).capitalize(), "lists": []}
+            for _ in range(lists):
+                board_list = {
+                    "id": new_id("list"),
+                    "title": sentence(1).capitalize(),
+                    "color": rng.choice(COLORS),
+                    "items": [],
+                }
+                for _ in range(cards):
+                    board_list["items"].append({
+                        "id": new_id("item"),
+                        "item_text": sentence(rng.randint(2, 5)).capitalize(),
+                        "priority": rng.choice(PRIORITIES),
+                        "description": sentence(rng.randint(0, 12)),
+                        "tags": rng.sample(TAGS, rng.randint(0, tags)),
+                        "completed": rng.random() < 0.3,
+                    })
+                board["lists"].append(board_list)
+            user["boards"].append(board)
+        data["users"].append(user)
+    data["next_ids"] = next_ids
+    return data
+
+
+def write(data: dict, filename: str):
+    with open(filename, "w") as file:
+        json.dump(data, file, indent=4)
+
+
+if __name__ == "__main__":
+    # python workspace.py data.json [users boards lists cards tags]
+    import sys
+
+    if len(sys.argv) < 2:
+        sys.exit("Uso: python workspace.py <destino> [users boards lists cards tags]")
+    sizes = [int(a) for a in sys.argv[2:7]]
+    write(generate(*sizes), sys.argv[1])
+    print(f"Workspace gerado em {sys.argv[1]}")
@@ -1,8 +1,16 @@
+import logging
+
 from board import Board
-from data_store import DataStore
+from board_cache import BoardCache
+from data_store import BoardSummary, DataStore, StoreEvent
 import flet as ft
+import instrumentation
+import render
+from search_index import SearchHit, SearchIndex
 from sidebar import Sidebar
 
+logger = logging.getLogger(__name__)
+
 class AppLayout(ft.Row):
     def __init__(self, app, page: ft.Page, store: DataStore, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -10,6 +18,21 @@ class AppLayout(ft.Row):
         self.page: ft.Page = page
         self.page.on_resized = self.page_resize
         self.store: DataStore = store
+        self.board_cache = BoardCache(self.store)
+        # Tiles da grelha "Your Boards" indexados pelo id do board
+        self.board_tiles: dict[int, ft.Container] = {}
+        self.boards_grid = ft.Row([], wrap=True)
+        self.store.add_listener(self.on_store_event)
+        self.search_index = SearchIndex(self.store)
+        self.search_field = ft.TextField(
+            hint_text="Pesquisar tarefas",
+            prefix_icon=ft.Icons.SEARCH,
+            on_submit=self.search,
+            dense=True,
+            width=250,
+            bgcolor=ft.Colors.WHITE,
+            border_radius=ft.border_radius.all(5),
+        )
         self.toggle_nav_rail_button = ft.IconButton(
             icon=ft.Icons.ARROW_CIRCLE_LEFT,
             icon_color=ft.Colors.BLUE_GREY_400,
@@ -115,8 +138,10 @@ class AppLayout(ft.Row):
         self.sidebar.sync_board_destinations()
         self.page.update()
 
+    @instrumentation.traced(category="ui")
     def set_board_view(self, i):
-        self.active_view = self.store.get_boards()[i]
+        summary = self.store.get_board_summaries()[i]
+        self.active_view = self.board_cache.get(summary.board_id)
         self.sidebar.bottom_nav_rail.selected_index = i
         self.sidebar.top_nav_rail.selected_index = None
         self.page_resize()
@@ -164,7 +189,7 @@ class AppLayout(ft.Row):
                                 ft.Text(f"User: {user['name']}", color=text_color),
                                 ft.Row(
                                     [
-                                        ft.Text(f"Boards: {len(user['boards'])}", color=text_color),
+                                        ft.Text(f"Boards: {self.store.get_board_count(user['name'])}", color=text_color),
                                         ft.IconButton(
                                             icon=ft.Icons.DELETE,
                                             icon_color=ft.Colors.RED,
@@ -220,67 +245,162 @@ class AppLayout(ft.Row):
             )
         self.page.update()
 
-    def hydrate_all_boards_view(self):
-        print("Atualizando a visualização de todos os boards")
-        boards = self.store.get_boards()
-        print(f"Boards encontrados: {boards}")
-        self.all_boards_view.controls[-1] = ft.Row(
-            [
-                ft.Container(
-                    content=ft.Row(
-                        [
-                            ft.Container(
-                                content=ft.Text(
-                                    value=b.name,
-                                    color=ft.Colors.BLACK,
-                                ),
-                                data=b,
-                                expand=True,
-                                on_click=self.board_click,
-                            ),
-                            ft.Container(
-                                content=ft.PopupMenuButton(
-                                    items=[
-                                        ft.PopupMenuItem(
-                                            content=ft.Text(
-                                                value="Delete",
-                                                theme_style=ft.TextThemeStyle.LABEL_MEDIUM,
-                                                text_align=ft.TextAlign.CENTER,
-                                            ),
-                                            on_click=self.app.delete_board,
-                                            data=b,
-                                        ),
-                                    ],
-                                    icon_color=ft.Colors.BLACK,
+    def board_tile(self, b: BoardSummary) -> ft.Container:
+        return ft.Container(
+            content=ft.Row(
+                [
+                    ft.Container(
+                        content=ft.Text(
+                            value=b.name,
+                            color=ft.Colors.BLACK,
+                        ),
+                        data=b,
+                        expand=True,
+                        on_click=self.board_click,
+                    ),
+                    ft.Container(
+                        content=ft.PopupMenuButton(
+                            items=[
+                                ft.PopupMenuItem(
+                                    content=ft.Text(
+                                        value="Delete",
+                                        theme_style=ft.TextThemeStyle.LABEL_MEDIUM,
+                                        text_align=ft.TextAlign.CENTER,
+                                    ),
+                                    on_click=self.app.delete_board,
+                                    data=b,
                                 ),
-                                padding=ft.padding.only(right=-10),
-                                border_radius=ft.border_radius.all(3),
-                            ),
-                        ],
-                        alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+                            ],
+                            icon_color=ft.Colors.BLACK,
+                        ),
+                        padding=ft.padding.only(right=-10),
+                        border_radius=ft.border_radius.all(3),
                     ),
-                    border=ft.border.all(1, ft.Colors.BLACK38),
-                    border_radius=ft.border_radius.all(5),
-                    bgcolor=ft.Colors.WHITE60,
-                    padding=ft.padding.all(10),
-                    width=250,
-                    data=b,
-                )
-                for b in boards
-            ],
-            wrap=True,
+                ],
+                alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+            ),
+            border=ft.border.all(1, ft.Colors.BLACK38),
+            border_radius=ft.border_radius.all(5),
+            bgcolor=ft.Colors.WHITE60,
+            padding=ft.padding.all(10),
+            width=250,
+            data=b,
         )
-        self.sidebar.sync_board_destinations()
-        self.page.update()
+
+    def rename_board_tile(self, tile: ft.Container, name: str):
+        tile.data.name = name
+        tile.content.controls[0].content.value = name
+
+    @instrumentation.traced(category="ui")
+    def hydrate_all_boards_view(self):
+        # Reconcilia a grelha com os boards do store reaproveitando os tiles
+        # existentes (indexados por id); só envia o que mudou.
+        boards = self.store.get_board_summaries()
+        logger.debug("Atualizando a visualização de todos os boards: %s", boards)
+        if self.boards_grid not in self.all_boards_view.controls:
+            self.all_boards_view.controls[-1] = self.boards_grid
+            if self.all_boards_view.page:
+                self.all_boards_view.update()
+        changed = False
+        tiles = {}
+        for b in boards:
+            tile = self.board_tiles.get(b.board_id)
+            if tile is None:
+                tile = self.board_tile(b)
+                changed = True
+            elif tile.data.name != b.name:
+                self.rename_board_tile(tile, b.name)
+                changed = True
+            tiles[b.board_id] = tile
+        controls = list(tiles.values())
+        if changed or controls != self.boards_grid.controls:
+            self.boards_grid.controls = controls
+            self.board_tiles = tiles
+            if self.boards_grid.page:
+                self.boards_grid.update()
+
+    def on_store_event(self, event: StoreEvent):
+        # Aplica só a alteração de um board à grelha, sem a reconstruir
+        if event.kind == "user" and event.action == "login":
+            # Os tiles são dos boards do utilizador anterior
+            self.board_tiles = {}
+            return
+        user = self.store._get_current_user()
+        if event.kind != "board" or not user or event.user not in (None, user["name"]):
+            return
+        if event.action == "add":
+            b = self.store.get_board_summary(event.board_id)
+            if b is not None and b.board_id not in self.board_tiles:
+                self.board_tiles[b.board_id] = self.board_tile(b)
+                self.boards_grid.controls.append(self.board_tiles[b.board_id])
+                if self.boards_grid.page:
+                    self.boards_grid.update()
+        elif event.action == "update":
+            tile = self.board_tiles.get(event.board_id)
+            b = self.store.get_board_summary(event.board_id)
+            if tile is not None and b is not None:
+                self.rename_board_tile(tile, b.name)
+                if tile.page:
+                    tile.update()
+        elif event.action == "remove":
+            tile = self.board_tiles.pop(event.board_id, None)
+            if tile is not None:
+                self.boards_grid.controls.remove(tile)
+                if self.boards_grid.page:
+                    self.boards_grid.update()
 
     def board_click(self, e):
         clicked_board = e.control.data
-        boards = self.store.get_boards()
+        boards = self.store.get_board_summaries()
         board_index = next((i for i, b in enumerate(boards) if b.board_id == clicked_board.board_id), None)
         if board_index is not None:
             self.sidebar.bottom_nav_change(board_index)
         else:
-            print(f"Erro: Board com ID {clicked_board.board_id} não encontrado na lista de boards.")
+            logger.error("Board com ID %s não encontrado na lista de boards.", clicked_board.board_id)
+
+    def search(self, e):
+        query = self.search_field.value.strip()
+        if not query or not self.store._get_current_user():
+            return
+        hits = self.search_index.search(query)
+        board_names = {b.board_id: b.name for b in self.store.get_board_summaries()}
+
+        def hit_click(e):
+            self.page.close(dialog)
+            self.open_search_hit(e.control.data)
+
+        dialog = ft.AlertDialog(
+            title=ft.Text(f"Resultados para '{query}'"),
+            content=ft.Column(
+                [
+                    ft.ListTile(
+                        title=ft.Text(hit.item_text, max_lines=1, overflow=ft.TextOverflow.ELLIPSIS),
+                        subtitle=ft.Text(f"{board_names.get(hit.board_id, '')} / {hit.list_title}"),
+                        data=hit,
+                        on_click=hit_click,
+                    )
+                    for hit in hits
+                ] or [ft.Text("Nenhuma tarefa encontrada.")],
+                scroll=ft.ScrollMode.AUTO,
+                height=300,
+                width=350,
+            ),
+            actions=[ft.TextButton("Fechar", on_click=lambda e: self.page.close(dialog))],
+        )
+        self.page.open(dialog)
+
+    def open_search_hit(self, hit: SearchHit):
+        # Abre o board já (o route_change que se segue reabre o mesmo board da
+        # cache) para poder mostrar o cartão na lista
+        boards = self.store.get_board_summaries()
+        board_index = next((i for i, b in enumerate(boards) if b.board_id == hit.board_id), None)
+        if board_index is None:
+            return
+        self.set_board_view(board_index)
+        self.sidebar.bottom_nav_change(board_index)
+        if isinstance(self.active_view, Board) and self.active_view.reveal_item(hit.list_id, hit.item_id) is None:
+            logger.warning("Cartão %s não encontrado na lista %s", hit.item_id, hit.list_id)
+        render.flush(self.page)
 
     def toggle_nav_rail(self, e):
         self.sidebar.visible = not self.sidebar.visible
@@ -327,7 +447,7 @@ class AppLayout(ft.Row):
                 ],
                 tight=True,
             ),
-            on_dismiss=lambda e: print("Diálogo de adição fechado!"),
+            on_dismiss=lambda e: logger.debug("Diálogo de adição fechado"),
         )
         self.page.open(dialog)
 
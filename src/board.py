@@ -1,27 +1,33 @@
-import itertools
+import logging
+
 import flet as ft
 from board_list import BoardList
-from data_store import DataStore
+from data_store import DataStore, mutation_origin
+import tagging
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from trello_app import TrelloApp
 
-class Board(ft.Container):
-    id_counter = itertools.count(start=1)  # Começa em 1
+logger = logging.getLogger(__name__)
 
+class Board(ft.Container):
     def __init__(self, app: "TrelloApp", store: DataStore, name: str, page: ft.Page, board_id=None, lists=None):
         self.page: ft.Page = page
-        self.board_id = board_id if board_id is not None else next(Board.id_counter)  # Usa ID do JSON ou novo ID
         self.store: DataStore = store
+        self.board_id = board_id if board_id is not None else self.store.allocate_id("board")  # Usa ID do JSON ou novo ID
         self.app = app
         self.name = name
         self.add_list_button = ft.FloatingActionButton(
             icon=ft.Icons.ADD, text="add a list", height=30, on_click=self.create_list
         )
+        self.suggest_tags_button = ft.FloatingActionButton(
+            icon=ft.Icons.AUTO_AWESOME, text="suggest tags", height=30, on_click=self.suggest_all_tags
+        )
 
+        # O último controlo são os botões do board; os anteriores são as listas
         self.board_lists = ft.Row(
-            controls=[self.add_list_button],
+            controls=[ft.Column([self.add_list_button, self.suggest_tags_button], spacing=10)],
             vertical_alignment=ft.CrossAxisAlignment.START,
             scroll=ft.ScrollMode.AUTO,
             expand=True,
@@ -149,19 +155,83 @@ class Board(ft.Container):
                 tight=True,
                 alignment=ft.MainAxisAlignment.CENTER,
             ),
-            on_dismiss=lambda e: print("Modal dialog dismissed!"),
+            on_dismiss=lambda e: logger.debug("Modal dialog dismissed"),
         )
         self.page.open(dialog)
         dialog_text.focus()
 
+    def reveal_item(self, list_id: int, item_id: int):
+        # Faz scroll até à lista e mostra o cartão nela
+        board_list = next((l for l in self.board_lists.controls[:-1] if l.board_list_id == list_id), None)
+        if board_list is None:
+            return None
+        item = board_list.reveal_item(item_id)
+        if self.board_lists.page:
+            self.board_lists.scroll_to(key=board_list.key, duration=300)
+        return item
+
+    def mutating(self):
+        # As mutações feitas pelos controlos deste board já estão refletidas
+        # neles: o BoardCache não o descarta por causa delas
+        return mutation_origin(self)
+
     def remove_list(self, list: BoardList, e):
         self.board_lists.controls.remove(list)
-        self.store.remove_list(self.board_id, list.board_list_id)
+        with self.mutating():
+            self.store.remove_list(self.board_id, list.board_list_id)
         self.page.update()
 
     def add_list(self, list: BoardList):
         self.board_lists.controls.insert(-1, list)
-        self.store.add_list(self.board_id, list)
+        with self.mutating():
+            self.store.add_list(self.board_id, list)
+        self.page.update()
+
+    def suggest_all_tags(self, e=None, lists: list[BoardList] | None = None):
+        lists = lists if lists is not None else self.board_lists.controls[:-1]
+        items = [item for board_list in lists for item in board_list.get_all_items()]
+        if not items:
+            self.page.snack_bar = ft.SnackBar(ft.Text("Não há tarefas para sugerir tags."), open=True)
+            self.page.update()
+            return
+        self.page.snack_bar = ft.SnackBar(ft.Text(f"A sugerir tags para {len(items)} tarefas..."), open=True)
+        self.page.update()
+        future = tagging.submit_batch([f"{item.item_text} {item.description}" for item in items])
+        future.add_done_callback(lambda f: self.suggestions_done(items, f))
+
+    def suggestions_done(self, items, future):
+        # Corre na thread do pool: f.result() relançaria o erro dentro do
+        # callback, onde ninguém o veria
+        error = future.exception()
+        if error is not None:
+            logger.error("Falha ao sugerir tags", exc_info=error)
+            self.page.snack_bar = ft.SnackBar(ft.Text(f"Falha ao sugerir tags: {error}"), open=True)
+            self.page.update()
+            return
+        self.apply_suggested_tags(items, future.result())
+
+    def apply_suggested_tags(self, items, results):
+        if results is None:
+            self.page.snack_bar = ft.SnackBar(
+                ft.Text("Modelos NLP indisponíveis: instale en_core_web_sm e pt_core_news_sm"), open=True
+            )
+            self.page.update()
+            return
+        changed_lists = []
+        tagged = 0
+        with self.mutating(), self.store.transaction():
+            for item, suggested_tags in zip(items, results):
+                new_tags = [tag for tag in suggested_tags if tag not in item.tags]
+                if new_tags:
+                    item.tags = item.tags + new_tags
+                    self.store.update_item(item.list.board_list_id, item.item_id, {"tags": list(item.tags)})
+                    item.list.filter_index.update(item)
+                    tagged += 1
+                    if item.list not in changed_lists:
+                        changed_lists.append(item.list)
+        for board_list in changed_lists:
+            board_list.apply_filters(None)
+        self.page.snack_bar = ft.SnackBar(ft.Text(f"Tags sugeridas para {tagged} tarefas."), open=True)
         self.page.update()
 
     def color_option_creator(self, color: str):
@@ -0,0 +1,46 @@
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+from data_store import DataStore, StoreEvent
+
+if TYPE_CHECKING:
+    from board import Board
+
+
+class BoardCache:
+    # LRU de controlos Board já construídos, indexado pelo id do board.
+    # Uma mutação no board, nas suas listas ou nos seus itens descarta a
+    # entrada correspondente, exceto se foi feita pelos controlos do próprio
+    # Board em cache (que já a refletem); mudar de utilizador descarta tudo.
+    def __init__(self, store: DataStore, capacity: int = 8):
+        self.store = store
+        self.capacity = capacity
+        self._boards: OrderedDict[int, "Board"] = OrderedDict()
+        self.store.add_listener(self.on_store_event)
+
+    def get(self, board_id: int) -> "Board | None":
+        board = self._boards.get(board_id)
+        if board is not None:
+            self._boards.move_to_end(board_id)
+            return board
+        board = self.store.get_board(board_id)
+        if board is not None:
+            self._boards[board_id] = board
+            if len(self._boards) > self.capacity:
+                self._boards.popitem(last=False)
+        return board
+
+    def invalidate(self, board_id: int):
+        self._boards.pop(board_id, None)
+
+    def clear(self):
+        self._boards.clear()
+
+    def on_store_event(self, event: StoreEvent):
+        if event.kind == "user":
+            self.clear()
+        elif event.board_id is not None:
+            if event.origin is None or event.origin is not self._boards.get(event.board_id):
+                self.invalidate(event.board_id)
+        else:
+            self.clear()
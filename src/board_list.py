@@ -1,15 +1,26 @@
+import logging
 from typing import TYPE_CHECKING
-import itertools
 import flet as ft
-from item import Item
+from item import Item, ItemData
 from data_store import DataStore
+from filter_index import FilterIndex
+import instrumentation
+import render
 
 if TYPE_CHECKING:
     from board import Board
 
-class BoardList(ft.Container):
-    id_counter = itertools.count()
+logger = logging.getLogger(__name__)
+
+# Listas com mais cartões do que isto usam um ListView virtualizado, que só
+# constrói controlos Item para a janela visível (mais uma margem) e vai
+# materializando os restantes à medida que o utilizador faz scroll.
+VIRTUALIZE_THRESHOLD = 50
+VIRTUAL_WINDOW = 25
+VIRTUAL_ITEM_EXTENT = 72
+VIRTUAL_HEIGHT = 500
 
+class BoardList(ft.Container):
     def __init__(
         self,
         board: "Board",
@@ -18,37 +29,48 @@ class BoardList(ft.Container):
         page: ft.Page,
         color: str = "",
         board_list_id: int = None,
+        virtualized: bool | None = None,
     ):
         self.page: ft.Page = page
-        self.board_list_id = board_list_id if board_list_id is not None else next(BoardList.id_counter)
         self.store: DataStore = store
+        self.board_list_id = board_list_id if board_list_id is not None else self.store.allocate_id("list")
         self.board = board
         self.title = title
         self.color = color
-        self.items = ft.Column([], tight=True, spacing=4)
 
-        # Carrega itens existentes do store para esta lista
-        for item_data in self.store.get_items(self.board_list_id):
-            new_item = Item(
+        # Itens existentes do store para esta lista; só são construídos como
+        # controlos em materialize_items()
+        self.pending_items = [
+            ItemData(
                 list=self,
-                store=self.store,
                 item_text=item_data["item_text"],
                 priority=item_data["priority"],
                 description=item_data["description"],
-                tags=item_data.get("tags", []),
+                tags=list(item_data.get("tags", [])),
                 item_id=item_data["id"],
                 completed=item_data["completed"]
             )
-            self.items.controls.append(
-                ft.Column([ft.Container(
-                    bgcolor=ft.Colors.BLACK26,
-                    border_radius=ft.border_radius.all(30),
-                    height=3,
-                    alignment=ft.alignment.center_right,
-                    width=200,
-                    opacity=0.0,
-                ), new_item])
+            for item_data in self.store.get_items(self.board_list_id)
+        ]
+        self.filter_index = FilterIndex()
+        for item_data in self.pending_items:
+            self.filter_index.add(item_data)
+        # Ids que passam os filtros ativos (None: sem filtros)
+        self.visible_ids: set[int] | None = None
+        self.virtualized = (
+            virtualized if virtualized is not None else len(self.pending_items) > VIRTUALIZE_THRESHOLD
+        )
+        if self.virtualized:
+            self.items = ft.ListView(
+                [],
+                spacing=4,
+                item_extent=VIRTUAL_ITEM_EXTENT,
+                height=VIRTUAL_HEIGHT,
+                on_scroll=self.items_scroll,
+                on_scroll_interval=50,
             )
+        else:
+            self.items = ft.Column([], tight=True, spacing=4)
 
         # Filtros de prioridade, estado e tags
         self.priority_filter = ft.Dropdown(
@@ -151,6 +173,15 @@ class BoardList(ft.Container):
                                 ),
                                 on_click=self.edit_title,
                             ),
+                            ft.PopupMenuItem(
+                                content=ft.Text(
+                                    value="Sugerir Tags",
+                                    theme_style=ft.TextThemeStyle.LABEL_MEDIUM,
+                                    text_align=ft.TextAlign.CENTER,
+                                    color=self.color,
+                                ),
+                                on_click=self.suggest_all_tags,
+                            ),
                             ft.PopupMenuItem(),
                             ft.PopupMenuItem(
                                 content=ft.Text(
@@ -208,7 +239,99 @@ class BoardList(ft.Container):
             on_will_accept=self.item_will_drag_accept,
             on_leave=self.item_drag_leave,
         )
-        super().__init__(content=self.view, data=self)
+        self.materialize_items(VIRTUAL_WINDOW if self.virtualized else len(self.pending_items))
+        # A key permite ao Board fazer scroll até esta lista
+        super().__init__(content=self.view, data=self, key=f"list-{self.board_list_id}")
+
+    def wrap_item(self, item: Item) -> ft.Column:
+        # Cada cartão vai numa Column com o indicador de drop por cima
+        return ft.Column(
+            [
+                ft.Container(
+                    bgcolor=ft.Colors.BLACK26,
+                    border_radius=ft.border_radius.all(30),
+                    height=3,
+                    alignment=ft.alignment.center_right,
+                    width=200,
+                    opacity=0.0,
+                ),
+                item,
+            ]
+        )
+
+    def materialize_items(self, count: int) -> int:
+        # Materializa, pela ordem do store, até `count` cartões visíveis com o
+        # filtro atual; os escondidos pelo caminho são criados invisíveis
+        end = 0
+        visible = 0
+        while end < len(self.pending_items) and visible < count:
+            if self.item_visible(self.pending_items[end]):
+                visible += 1
+            end += 1
+        return self.materialize_prefix(end)
+
+    def materialize_prefix(self, end: int) -> int:
+        # Constrói os primeiros `end` cartões por materializar
+        batch, self.pending_items = self.pending_items[:end], self.pending_items[end:]
+        for item_data in batch:
+            new_item = Item(
+                list=self,
+                store=self.store,
+                item_text=item_data.item_text,
+                priority=item_data.priority,
+                description=item_data.description,
+                tags=item_data.tags,
+                item_id=item_data.item_id,
+                completed=item_data.completed
+            )
+            item_control = self.wrap_item(new_item)
+            item_control.visible = self.item_visible(new_item)
+            self.items.controls.append(item_control)
+        return len(batch)
+
+    def items_scroll(self, e: ft.OnScrollEvent):
+        # Materializa a janela seguinte quando o scroll se aproxima do fim
+        if self.pending_items and e.pixels >= e.max_scroll_extent - VIRTUAL_ITEM_EXTENT * 5:
+            if self.materialize_items(VIRTUAL_WINDOW):
+                self.items.update()
+
+    def fill_visible_window(self):
+        # Lista virtualizada: materializa cartões por materializar até haver
+        # uma janela de cartões visíveis, senão um filtro que esconde todos os
+        # construídos deixava os restantes inalcançáveis pelo scroll
+        if not self.pending_items:
+            return
+        missing = VIRTUAL_WINDOW - sum(1 for item_control in self.items.controls if item_control.visible)
+        if missing > 0 and self.materialize_items(missing):
+            render.invalidate(self.page, self.items)
+
+    def reveal_item(self, item_id: int) -> Item | None:
+        # Mostra um cartão (ex.: resultado da pesquisa): materializa-o se ainda
+        # não foi, limpa os filtros que o escondam, faz scroll até ele e
+        # destaca-o
+        position = next((i for i, d in enumerate(self.pending_items) if d.item_id == item_id), None)
+        if position is not None:
+            self.materialize_prefix(position + 1)
+            render.invalidate(self.page, self.items)
+        items = self.get_items()
+        index = next((i for i, item in enumerate(items) if item.item_id == item_id), None)
+        if index is None:
+            return None
+        item = items[index]
+        if not self.item_visible(item):
+            self.priority_filter.value = "Todas"
+            self.status_filter.value = "Todas"
+            self.selected_tags = []
+            render.invalidate(self.page, self.priority_filter, self.status_filter)
+            self.apply_filters(None)
+        if self.virtualized and self.items.page:
+            # Os cartões novos têm de chegar ao cliente antes do scroll; o
+            # offset conta os cartões visíveis antes deste
+            render.flush(self.page)
+            before = sum(1 for item_control in self.items.controls[:index] if item_control.visible)
+            self.items.scroll_to(offset=before * (VIRTUAL_ITEM_EXTENT + self.items.spacing), duration=300)
+        item.highlight()
+        return item
 
     def update_theme(self):
         if self.page.theme_mode == ft.ThemeMode.DARK:
@@ -217,12 +340,18 @@ class BoardList(ft.Container):
             self.inner_list.bgcolor = self.color if self.color else ft.Colors.BACKGROUND
         self.update()
 
+    def get_items(self) -> list[Item]:
+        return [item_control.controls[1] for item_control in self.items.controls]
+
+    def get_all_items(self) -> list[Item | ItemData]:
+        # Inclui os cartões ainda não materializados de listas virtualizadas
+        return self.get_items() + self.pending_items
+
+    def suggest_all_tags(self, e):
+        self.board.suggest_all_tags(lists=[self])
+
     def get_all_tags(self):
-        all_tags = set()
-        for item_control in self.items.controls:
-            item = item_control.controls[1]
-            all_tags.update(item.tags)
-        return sorted(all_tags)
+        return self.filter_index.tags()
 
     def open_tags_filter_dialog(self, e):
         all_tags = self.get_all_tags()
@@ -262,52 +391,60 @@ class BoardList(ft.Container):
     def update_selected_tags(self, e):
         pass
 
-    def apply_filters(self, e):
-        for item_control in self.items.controls:
-            item = item_control.controls[1]
-            item_visible = True
-
-            if self.priority_filter.value != "Todas":
-                if item.priority != self.priority_filter.value:
-                    item_visible = False
+    def filtered_ids(self) -> set[int] | None:
+        priority = self.priority_filter.value if self.priority_filter.value != "Todas" else None
+        completed = {"Concluídas": True, "Não Concluídas": False}.get(self.status_filter.value)
+        if priority is None and completed is None and not self.selected_tags:
+            return None
+        return self.filter_index.match(priority, completed, self.selected_tags)
 
-            if self.status_filter.value != "Todas":
-                is_completed = item.checkbox.value
-                if self.status_filter.value == "Concluídas" and not is_completed:
-                    item_visible = False
-                elif self.status_filter.value == "Não Concluídas" and is_completed:
-                    item_visible = False
+    def item_visible(self, item: Item | ItemData) -> bool:
+        return self.visible_ids is None or item.item_id in self.visible_ids
 
-            if self.selected_tags:
-                if not any(tag in item.tags for tag in self.selected_tags):
-                    item_visible = False
+    def item_changed(self, item: Item | ItemData):
+        # Chamado depois de editar os campos filtráveis de um cartão
+        self.filter_index.update(item)
+        self.apply_filters(None)
 
-            item_control.visible = item_visible
-
-        self.page.update()
+    @instrumentation.traced(category="ui")
+    def apply_filters(self, e):
+        # Só os cartões cuja visibilidade muda são enviados; os que ainda
+        # estão por materializar recebem o filtro ao serem criados
+        self.visible_ids = self.filtered_ids()
+        for item_control in self.items.controls:
+            visible = self.item_visible(item_control.controls[1])
+            if item_control.visible != visible:
+                item_control.visible = visible
+                render.invalidate(self.page, item_control)
+        self.fill_visible_window()
 
+    @instrumentation.traced(category="ui")
     def item_drag_accept(self, e):
         src = self.page.get_control(e.src_id)
-        self.add_item(
-            item_text=src.data.item_text,
-            priority=src.data.priority,
-            description=src.data.description,
-            tags=src.data.tags,
-            completed=src.data.completed
-        )
-        src.data.list.remove_item(src.data)
+        with self.board.mutating(), self.store.transaction():
+            self.add_item(
+                item_text=src.data.item_text,
+                priority=src.data.priority,
+                description=src.data.description,
+                tags=src.data.tags,
+                completed=src.data.completed
+            )
+            src.data.list.remove_item(src.data)
         self.end_indicator.opacity = 0.0
-        self.update()
+        render.invalidate(self.page, self.end_indicator)
 
+    @instrumentation.traced(category="ui")
     def item_will_drag_accept(self, e):
         if e.data == "true":
             self.end_indicator.opacity = 1.0
-        self.update()
+        render.invalidate(self.page, self.end_indicator)
 
+    @instrumentation.traced(category="ui")
     def item_drag_leave(self, e):
         self.end_indicator.opacity = 0.0
-        self.update()
+        render.invalidate(self.page, self.end_indicator)
 
+    @instrumentation.traced(category="ui")
     def list_drag_accept(self, e):
         src = self.page.get_control(e.src_id)
         l = self.board.content.controls
@@ -315,16 +452,18 @@ class BoardList(ft.Container):
         from_index = l.index(src.content.data)
         l[to_index], l[from_index] = l[from_index], l[to_index]
         self.inner_list.border = ft.border.all(2, ft.Colors.BLACK12)
-        self.page.update()
+        render.invalidate(self.page, self.board.content)
 
+    @instrumentation.traced(category="ui")
     def list_will_drag_accept(self, e):
         if e.data == "true":
             self.inner_list.border = ft.border.all(2, ft.Colors.BLACK)
-        self.update()
+        render.invalidate(self.page, self.inner_list)
 
+    @instrumentation.traced(category="ui")
     def list_drag_leave(self, e):
         self.inner_list.border = ft.border.all(2, ft.Colors.BLACK12)
-        self.update()
+        render.invalidate(self.page, self.inner_list)
 
     def delete_list(self, e):
         self.board.remove_list(self, e)
@@ -414,7 +553,7 @@ class BoardList(ft.Container):
                 tight=True,
                 spacing=10,
             ),
-            on_dismiss=lambda e: print("Modal dismissed"),
+            on_dismiss=lambda e: logger.debug("Modal dismissed"),
         )
 
         self.page.open(modal)
@@ -440,22 +579,14 @@ class BoardList(ft.Container):
             if chosen_control in controls_list
             else None
         )
-        control_to_add = ft.Column(
-            [
-                ft.Container(
-                    bgcolor=ft.Colors.BLACK26,
-                    border_radius=ft.border_radius.all(30),
-                    height=3,
-                    alignment=ft.alignment.center_right,
-                    width=200,
-                    opacity=0.0,
-                )
-            ]
-        )
-
         if (from_index is not None) and (to_index is not None):
             self.items.controls.insert(to_index, self.items.controls.pop(from_index))
             self.set_indicator_opacity(swap_control, 0.0)
+            # Os cartões construídos são o início da lista do store, pela
+            # mesma ordem: as posições na UI e no store coincidem
+            with self.board.mutating(), self.store.transaction():
+                self.store.remove_item(self.board_list_id, chosen_control.item_id)
+                self.store.add_item(self.board_list_id, chosen_control, to_index)
         elif to_index is not None:
             new_item = Item(
                 self,
@@ -466,8 +597,28 @@ class BoardList(ft.Container):
                 tags=tags,
                 completed=completed
             )
-            control_to_add.controls.append(new_item)
-            self.items.controls.insert(to_index, control_to_add)
+            self.index_new_item(new_item)
+            item_control = self.wrap_item(new_item)
+            item_control.visible = self.item_visible(new_item)
+            self.items.controls.insert(to_index, item_control)
+            with self.board.mutating():
+                self.store.add_item(self.board_list_id, new_item, to_index)
+        elif self.pending_items:
+            # Lista virtualizada ainda não toda materializada: o cartão fica no
+            # fim, depois dos que faltam materializar
+            new_item = ItemData(
+                self,
+                item_text,
+                priority,
+                description,
+                tags=tags,
+                item_id=self.store.allocate_id("item"),
+                completed=completed
+            )
+            self.pending_items.append(new_item)
+            with self.board.mutating():
+                self.store.add_item(self.board_list_id, new_item)
+            self.index_new_item(new_item)
         else:
             new_item = Item(
                 self,
@@ -478,19 +629,32 @@ class BoardList(ft.Container):
                 tags=tags,
                 completed=completed
             )
-            control_to_add.controls.append(new_item)
-            self.items.controls.append(control_to_add)
-            self.store.add_item(self.board_list_id, new_item)
+            self.index_new_item(new_item)
+            item_control = self.wrap_item(new_item)
+            item_control.visible = self.item_visible(new_item)
+            self.items.controls.append(item_control)
+            with self.board.mutating():
+                self.store.add_item(self.board_list_id, new_item)
+
+        render.invalidate(self.page, self.items)
 
-        self.page.update()
+    def index_new_item(self, item: Item | ItemData):
+        self.filter_index.add(item)
+        self.visible_ids = self.filtered_ids()
+        self.fill_visible_window()
 
     def remove_item(self, item: Item):
         controls_list = [x.controls[1] for x in self.items.controls]
         del self.items.controls[controls_list.index(item)]
-        self.store.remove_item(self.board_list_id, item.item_id)
-        self.view.update()
+        with self.board.mutating():
+            self.store.remove_item(self.board_list_id, item.item_id)
+        self.filter_index.remove(item.item_id)
+        if self.visible_ids is not None:
+            self.visible_ids.discard(item.item_id)
+        render.invalidate(self.page, self.items)
 
     def set_indicator_opacity(self, item, opacity):
         controls_list = [x.controls[1] for x in self.items.controls]
-        self.items.controls[controls_list.index(item)].controls[0].opacity = opacity
-        self.view.update()
\ No newline at end of file
+        indicator = self.items.controls[controls_list.index(item)].controls[0]
+        indicator.opacity = opacity
+        render.invalidate(self.page, indicator)
\ No newline at end of file
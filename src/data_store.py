@@ -1,5 +1,9 @@
+import threading
+from contextlib import contextmanager
 from typing import TYPE_CHECKING
 
+import instrumentation
+
 if TYPE_CHECKING:
     from board import Board
     from board_list import BoardList
@@ -7,8 +11,107 @@ if TYPE_CHECKING:
     from item import Item
 
 
+# Campos de um item que podem ser alterados com update_item
+ITEM_FIELDS = ("item_text", "priority", "description", "tags", "completed")
+
+# Métodos da API instrumentados em todas as implementações (TROLLI_TRACE)
+TRACED_METHODS = (
+    "allocate_id", "add_board", "get_board", "get_boards", "get_board_summaries", "get_board_summary",
+    "update_board", "remove_board", "add_user", "get_users", "get_user", "remove_user", "get_board_count",
+    "add_list", "get_lists_by_board", "remove_list", "add_item", "get_items", "update_item", "remove_item",
+    "set_current_user", "flush", "close",
+)
+
+
+class BoardSummary:
+    # Dados mínimos de um board para listagens e navegação, sem construir a
+    # árvore de controlos Board/BoardList/Item.
+    def __init__(self, board_id: int, name: str, list_count: int = 0, item_count: int = 0):
+        self.board_id = board_id
+        self.name = name
+        self.list_count = list_count
+        self.item_count = item_count
+
+    def __repr__(self):
+        return f"BoardSummary({self.board_id}, {self.name!r}, lists={self.list_count}, items={self.item_count})"
+
+
+_origin = threading.local()
+
+
+@contextmanager
+def mutation_origin(origin):
+    # Marca as mutações feitas neste bloco (nesta thread) como vindas de
+    # `origin`, normalmente um Board; os eventos são emitidos de forma
+    # síncrona, por isso levam-no em StoreEvent.origin
+    previous = getattr(_origin, "value", None)
+    _origin.value = origin
+    try:
+        yield
+    finally:
+        _origin.value = previous
+
+
+class StoreEvent:
+    # Notificação de uma mutação: kind é "user", "board", "list" ou "item" e
+    # action é "add", "update", "remove" ou "login". origin é o objeto que fez
+    # a mutação (ver mutation_origin) ou None.
+    def __init__(self, kind: str, action: str, user: str | None = None,
+                 board_id: int | None = None, list_id: int | None = None, item_id: int | None = None):
+        self.kind = kind
+        self.action = action
+        self.user = user
+        self.board_id = board_id
+        self.list_id = list_id
+        self.item_id = item_id
+        self.origin = getattr(_origin, "value", None)
+
+    def __repr__(self):
+        return (f"StoreEvent({self.kind}/{self.action}, user={self.user!r}, board={self.board_id}, "
+                f"list={self.list_id}, item={self.item_id})")
+
+
 class DataStore:
 
+    def __init__(self):
+        self._listeners = []
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        instrumentation.trace_methods(cls, TRACED_METHODS, category="store")
+
+    def add_listener(self, listener) -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _emit(self, kind: str, action: str, **fields) -> None:
+        if not self._listeners:
+            return
+        event = StoreEvent(kind, action, **fields)
+        for listener in list(self._listeners):
+            listener(event)
+
+    @contextmanager
+    def transaction(self):
+        # Agrupa as mutações de uma ação de UI numa única escrita; por omissão
+        # cada mutação é persistida de imediato.
+        yield
+
+    def flush(self) -> None:
+        # Grava já as escritas pendentes; por omissão não há nenhuma
+        pass
+
+    def close(self) -> None:
+        # Grava o que estiver pendente e liberta recursos; por omissão nada
+        pass
+
+    def allocate_id(self, kind: str) -> int:
+        # Devolve um id novo e nunca reutilizado para "board", "list" ou "item"
+        raise NotImplementedError
+
     def add_board(self, model) -> None:
         raise NotImplementedError
 
@@ -18,6 +121,12 @@ class DataStore:
     def get_boards(self) -> list["Board"]:
         raise NotImplementedError
 
+    def get_board_summaries(self) -> list[BoardSummary]:
+        raise NotImplementedError
+
+    def get_board_summary(self, id) -> BoardSummary | None:
+        return next((b for b in self.get_board_summaries() if b.board_id == id), None)
+
     def update_board(self, model, update):
         raise NotImplementedError
 
@@ -36,6 +145,10 @@ class DataStore:
     def remove_user(self, id) -> None:
         raise NotImplementedError
 
+    def get_board_count(self, user_name: str) -> int:
+        # Número de boards de um utilizador sem carregar os boards
+        raise NotImplementedError
+
     def add_list(self, board, model) -> None:
         raise NotImplementedError
 
@@ -51,7 +164,8 @@ class DataStore:
     def remove_list(self, board, id) -> None:
         raise NotImplementedError
 
-    def add_item(self, board_list, model) -> None:
+    def add_item(self, board_list, model, index: int | None = None) -> None:
+        # index: posição na lista (None ou além do fim: acrescenta no fim)
         raise NotImplementedError
 
     def get_items(self, board_list) -> list["Item"]:
@@ -63,5 +177,8 @@ class DataStore:
     def get_items_by_board(self, board) -> list["Item"]:
         raise NotImplementedError
 
+    def update_item(self, board_list, id, fields: dict) -> None:
+        raise NotImplementedError
+
     def remove_item(self, board_list, id) -> None:
         raise NotImplementedError
@@ -0,0 +1,66 @@
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from item import Item, ItemData
+
+
+class FilterIndex:
+    # Índices invertidos dos cartões de uma lista (prioridade, estado e tag
+    # -> ids), mantidos nas inserções, edições e remoções, para que mudar um
+    # filtro seja uma interseção de conjuntos em vez de percorrer os cartões.
+    def __init__(self):
+        self.item_ids: set[int] = set()
+        self.by_priority: dict[str, set[int]] = {}
+        self.by_completed: dict[bool, set[int]] = {}
+        self.by_tag: dict[str, set[int]] = {}
+        self._entries: dict[int, tuple[str, bool, tuple[str, ...]]] = {}
+
+    def add(self, item: "Item | ItemData"):
+        if item.item_id in self._entries:
+            self.remove(item.item_id)
+        entry = (item.priority, bool(item.completed), tuple(dict.fromkeys(item.tags)))
+        self._entries[item.item_id] = entry
+        self.item_ids.add(item.item_id)
+        self.by_priority.setdefault(entry[0], set()).add(item.item_id)
+        self.by_completed.setdefault(entry[1], set()).add(item.item_id)
+        for tag in entry[2]:
+            self.by_tag.setdefault(tag, set()).add(item.item_id)
+
+    def update(self, item: "Item | ItemData"):
+        self.add(item)
+
+    def remove(self, item_id: int):
+        entry = self._entries.pop(item_id, None)
+        if entry is None:
+            return
+        self.item_ids.discard(item_id)
+        self._discard(self.by_priority, entry[0], item_id)
+        self._discard(self.by_completed, entry[1], item_id)
+        for tag in entry[2]:
+            self._discard(self.by_tag, tag, item_id)
+
+    def _discard(self, index: dict, key, item_id: int):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(item_id)
+            if not ids:
+                del index[key]
+
+    def match(
+        self,
+        priority: str | None = None,
+        completed: bool | None = None,
+        tags: list[str] | None = None,
+    ) -> set[int]:
+        # Ids que passam todos os filtros; None (ou sem tags) não filtra
+        ids = self.item_ids
+        if priority is not None:
+            ids = ids & self.by_priority.get(priority, set())
+        if completed is not None:
+            ids = ids & self.by_completed.get(completed, set())
+        if tags:
+            ids = ids & set().union(*(self.by_tag.get(tag, set()) for tag in tags))
+        return ids
+
+    def tags(self) -> list[str]:
+        return sorted(self.by_tag)
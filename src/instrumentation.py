@@ -0,0 +1,144 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+# Instrumentação opcional dos caminhos quentes (store, gravações, handlers de
+# UI). Com TROLLI_TRACE=1 as funções decoradas registam num ring buffer em
+# memória (TROLLI_TRACE_BUFFER eventos, por omissão 20000) e o buffer pode ser
+# gravado como trace do Chrome (chrome://tracing ou https://ui.perfetto.dev).
+# Sem a variável os decoradores devolvem a própria função: não há custo.
+ENABLED = os.environ.get("TROLLI_TRACE", "") not in ("", "0")
+BUFFER_SIZE = int(os.environ.get("TROLLI_TRACE_BUFFER", "20000"))
+TRACE_FILE = os.environ.get("TROLLI_TRACE_FILE", "trace.json")
+
+logger = logging.getLogger(__name__)
+
+# Eventos: (fase, nome, categoria, início ns, duração ns ou valor, thread)
+_events: deque = deque(maxlen=BUFFER_SIZE)
+# Por nome: [chamadas, tempo total ns, máximo ns]
+_stats: dict[str, list[int]] = {}
+_bytes: dict[str, int] = {}
+_lock = threading.Lock()
+_NULL_SPAN = nullcontext()
+
+
+def _record(name: str, category: str, start: int, duration: int):
+    _events.append(("X", name, category, start, duration, threading.get_ident()))
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = [0, 0, 0]
+        stats[0] += 1
+        stats[1] += duration
+        if duration > stats[2]:
+            stats[2] = duration
+
+
+def traced(name: str | None = None, category: str = "app"):
+    # Decorador: regista a duração de cada chamada com o nome dado (por
+    # omissão o __qualname__ da função)
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _record(label, category, start, time.perf_counter_ns() - start)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def _span(name: str, category: str):
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        _record(name, category, start, time.perf_counter_ns() - start)
+
+
+def span(name: str, category: str = "app"):
+    # Context manager para blocos que não são uma função inteira
+    return _span(name, category) if ENABLED else _NULL_SPAN
+
+
+def trace_methods(cls, names, category: str = "app"):
+    # Envolve os métodos definidos na própria classe (não os herdados, que já
+    # foram envolvidos na classe onde estão definidos)
+    if not ENABLED:
+        return
+    for name in names:
+        fn = cls.__dict__.get(name)
+        if fn is not None:
+            setattr(cls, name, traced(f"{cls.__name__}.{name}", category)(fn))
+
+
+def add_bytes(name: str, count: int):
+    # Bytes escritos em disco; no trace aparece como contador acumulado
+    if not ENABLED:
+        return
+    with _lock:
+        total = _bytes[name] = _bytes.get(name, 0) + count
+    _events.append(("C", name, "io", time.perf_counter_ns(), total, threading.get_ident()))
+
+
+def summary() -> list[dict]:
+    with _lock:
+        rows = [
+            {
+                "name": name,
+                "calls": calls,
+                "total_ms": total / 1e6,
+                "mean_ms": total / calls / 1e6,
+                "max_ms": longest / 1e6,
+            }
+            for name, (calls, total, longest) in _stats.items()
+        ]
+        written = dict(_bytes)
+    rows.sort(key=lambda r: r["total_ms"], reverse=True)
+    for row in rows:
+        row["bytes"] = written.get(row["name"], 0)
+    return rows
+
+
+def reset():
+    with _lock:
+        _events.clear()
+        _stats.clear()
+        _bytes.clear()
+
+
+def chrome_trace() -> dict:
+    pid = os.getpid()
+    trace_events = []
+    for phase, name, category, start, value, thread in list(_events):
+        event = {"name": name, "cat": category, "ph": phase, "ts": start / 1000, "pid": pid, "tid": thread}
+        if phase == "X":
+            event["dur"] = value / 1000
+        else:
+            event["args"] = {"bytes": value}
+        trace_events.append(event)
+    return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+
+def dump_chrome_trace(filename: str = TRACE_FILE):
+    if not ENABLED:
+        return
+    with open(filename, "w") as file:
+        json.dump(chrome_trace(), file)
+    logger.info("Trace gravado em %s (%d eventos)", filename, len(_events))
+    for row in summary()[:20]:
+        logger.info(
+            "%-45s %7d chamadas %10.1f ms total %8.3f ms média %8.1f ms máx %10d bytes",
+            row["name"], row["calls"], row["total_ms"], row["mean_ms"], row["max_ms"], row["bytes"],
+        )
@@ -1,33 +1,40 @@
+import logging
+import threading
 from typing import TYPE_CHECKING
-import itertools
 import flet as ft
 from data_store import DataStore
-import spacy
-from spacy.cli import download
-from langdetect import detect
+import instrumentation
+import render
+import tagging
 
 if TYPE_CHECKING:
     from board_list import BoardList
 
-class Item(ft.Container):
-    id_counter = itertools.count(start=1)
+logger = logging.getLogger(__name__)
 
-    # Verifica e instala o modelo de inglês
-    try:
-        nlp_en = spacy.load("en_core_web_sm")
-    except OSError:
-        print("Baixando modelo 'en_core_web_sm'...")
-        download("en_core_web_sm")
-        nlp_en = spacy.load("en_core_web_sm")
+class ItemData:
+    # Cartão de uma lista virtualizada que ainda não foi materializado num
+    # controlo Item; tem os mesmos atributos de dados que o Item.
+    def __init__(
+        self,
+        list: "BoardList",
+        item_text: str,
+        priority: str = "Baixa",
+        description: str = "",
+        tags: list[str] = None,
+        item_id: int = None,
+        completed: bool = False
+    ):
+        self.list = list
+        self.item_text = item_text
+        self.priority = priority
+        self.description = description
+        self.tags = tags if tags is not None else []
+        self.item_id = item_id
+        self.completed = completed
 
-    # Verifica e instala o modelo de português
-    try:
-        nlp_pt = spacy.load("pt_core_news_sm")
-    except OSError:
-        print("Baixando modelo 'pt_core_news_sm'...")
-        download("pt_core_news_sm")
-        nlp_pt = spacy.load("pt_core_news_sm")
 
+class Item(ft.Container):
     def __init__(
         self,
         list: "BoardList",
@@ -39,8 +46,8 @@ class Item(ft.Container):
         item_id: int = None,
         completed: bool = False
     ):
-        self.item_id = item_id if item_id is not None else next(Item.id_counter)
         self.store: DataStore = store
+        self.item_id = item_id if item_id is not None else self.store.allocate_id("item")
         self.list = list
         self.item_text = item_text
         self.priority = priority
@@ -98,6 +105,21 @@ class Item(ft.Container):
         )
         super().__init__(content=self.view)
 
+    def highlight(self, seconds: float = 2.0):
+        # Destaque temporário do cartão (ex.: resultado da pesquisa)
+        self.card_item.elevation = 12
+        self.card_item.color = ft.Colors.AMBER_200
+        render.invalidate(self.list.page, self.card_item)
+
+        def clear():
+            self.card_item.elevation = 1
+            self.card_item.color = self.get_priority_color()
+            render.invalidate(self.list.page, self.card_item)
+
+        timer = threading.Timer(seconds, clear)
+        timer.daemon = True
+        timer.start()
+
     def get_priority_color(self):
         colors = {
             "Baixa": ft.Colors.GREEN_100,
@@ -106,36 +128,17 @@ class Item(ft.Container):
         }
         return colors.get(self.priority, ft.Colors.GREY_100)
 
-    def detect_language(self, text: str) -> str:
-        try:
-            lang = detect(text)
-            if lang.startswith("pt"):
-                return "pt"
-            elif lang.startswith("en"):
-                return "en"
-            else:
-                return "en"
-        except:
-            return "en"
+    def open_edit_dialog(self, e):
+        # Sugestão de tags em curso (corre no pool do módulo tagging)
+        suggestion = {"future": None}
 
-    def suggest_tags(self):
-        text_to_analyze = f"{self.item_text} {self.description}".strip()
-        if not text_to_analyze:
-            return []
-        lang = self.detect_language(text_to_analyze)
-        nlp = self.nlp_pt if lang == "pt" else self.nlp_en
-        doc = nlp(text_to_analyze.lower())
-        tags = set()
-        for token in doc:
-            if token.pos_ in ["NOUN", "PROPN"] and not token.is_stop:
-                tags.add(token.text)
-        for ent in doc.ents:
-            tags.add(ent.text.lower())
-        suggested_tags = [tag for tag in tags if len(tag) > 2]
-        return suggested_tags[:5]
+        def cancel_suggestion(e=None):
+            future, suggestion["future"] = suggestion["future"], None
+            if future is not None:
+                future.cancel()
 
-    def open_edit_dialog(self, e):
         def close_dlg(e):
+            cancel_suggestion()
             if name_field.value:
                 self.item_text = name_field.value
                 self.title_text.value = self.item_text  # Atualiza o texto exibido
@@ -143,14 +146,20 @@ class Item(ft.Container):
                 self.description = description_field.value
                 self.tags = [tag.strip() for tag in tags_field.value.split(",") if tag.strip()]
                 self.card_item.color = self.get_priority_color()
-                self.store.remove_item(self.list.board_list_id, self.item_id)
-                self.store.add_item(self.list.board_list_id, self)
-                self.list.apply_filters(None)
+                with self.list.board.mutating():
+                    self.store.update_item(self.list.board_list_id, self.item_id, {
+                        "item_text": self.item_text,
+                        "priority": self.priority,
+                        "description": self.description,
+                        "tags": list(self.tags),
+                    })
+                self.list.item_changed(self)
                 self.list.page.update()
             self.list.page.close(dialog)
 
         def open_delete_confirmation(e):
             def confirm_delete(e):
+                cancel_suggestion()
                 self.list.remove_item(self)
                 self.list.page.close(confirm_dialog)
                 self.list.page.close(dialog)
@@ -176,12 +185,44 @@ class Item(ft.Container):
             self.list.page.open(confirm_dialog)
 
         def apply_suggested_tags(e):
-            suggested_tags = self.suggest_tags()
+            cancel_suggestion()
+            suggest_tags_button.disabled = True
+            suggest_progress.visible = True
+            self.list.page.update()
+            future = tagging.submit(f"{self.item_text} {self.description}")
+            suggestion["future"] = future
+            future.add_done_callback(show_suggested_tags)
+
+        def show_suggested_tags(future):
+            # Corre na thread do pool; ignora resultados de pedidos cancelados
+            # ou substituídos entretanto.
+            if future.cancelled() or suggestion["future"] is not future:
+                return
+            suggestion["future"] = None
+            suggest_tags_button.disabled = False
+            suggest_progress.visible = False
+            error = future.exception()
+            if error is not None:
+                logger.error("Falha ao sugerir tags", exc_info=error)
+                self.list.page.snack_bar = ft.SnackBar(
+                    content=ft.Text(f"Falha ao sugerir tags: {error}"),
+                    open=True
+                )
+                self.list.page.update()
+                return
+            lang, suggested_tags = future.result()
+            if suggested_tags is None:
+                self.list.page.snack_bar = ft.SnackBar(
+                    content=ft.Text("Modelos NLP indisponíveis: instale en_core_web_sm e pt_core_news_sm"),
+                    open=True
+                )
+                self.list.page.update()
+                return
             current_tags = set(self.tags)
             current_tags.update(suggested_tags)
             tags_field.value = ", ".join(current_tags)
             self.list.page.snack_bar = ft.SnackBar(
-                content=ft.Text(f"Sugeridas tags em {self.detect_language(f'{self.item_text} {self.description}')}"),
+                content=ft.Text(f"Sugeridas tags em {lang}"),
                 open=True
             )
             self.list.page.update()
@@ -215,8 +256,9 @@ class Item(ft.Container):
             on_click=apply_suggested_tags,
             bgcolor=ft.Colors.BLUE_200,
             color=ft.Colors.BLACK,
-            width=200,
+            width=170,
         )
+        suggest_progress = ft.ProgressRing(width=20, height=20, stroke_width=2, visible=False)
         delete_button = ft.ElevatedButton(
             text="Excluir",
             bgcolor=ft.Colors.RED_200,
@@ -232,7 +274,10 @@ class Item(ft.Container):
                     priority_dropdown,
                     description_field,
                     tags_field,
-                    suggest_tags_button,
+                    ft.Row(
+                        [suggest_tags_button, suggest_progress],
+                        spacing=10,
+                    ),
                     ft.Row(
                         [
                             delete_button,
@@ -245,16 +290,19 @@ class Item(ft.Container):
                 spacing=10,
                 width=200,
             ),
+            on_dismiss=cancel_suggestion,
         )
         self.list.page.open(dialog)
 
     def update_status(self, e):
+        # O checkbox já está atualizado no cliente; só a visibilidade do
+        # cartão pode mudar (apply_filters invalida a lista)
         self.completed = self.checkbox.value
-        self.store.remove_item(self.list.board_list_id, self.item_id)
-        self.store.add_item(self.list.board_list_id, self)
-        self.list.apply_filters(None)
-        self.list.page.update()
+        with self.list.board.mutating():
+            self.store.update_item(self.list.board_list_id, self.item_id, {"completed": self.completed})
+        self.list.item_changed(self)
 
+    @instrumentation.traced(category="ui")
     def drag_accept(self, e):
         src = self.page.get_control(e.src_id)
         if src.content.content == e.control.content:
@@ -267,26 +315,29 @@ class Item(ft.Container):
             self.card_item.elevation = 1
             e.control.update()
             return
-        self.list.add_item(
-            item_text=src.data.item_text,
-            priority=src.data.priority,
-            description=src.data.description,
-            tags=src.data.tags,
-            completed=src.data.completed,
-            swap_control=self
-        )
-        src.data.list.remove_item(src.data)
+        with self.list.board.mutating(), self.store.transaction():
+            self.list.add_item(
+                item_text=src.data.item_text,
+                priority=src.data.priority,
+                description=src.data.description,
+                tags=src.data.tags,
+                completed=src.data.completed,
+                swap_control=self
+            )
+            src.data.list.remove_item(src.data)
         self.list.set_indicator_opacity(self, 0.0)
         self.card_item.elevation = 1
-        self.list.page.update()
+        render.invalidate(self.list.page, self.card_item)
 
+    @instrumentation.traced(category="ui")
     def drag_will_accept(self, e):
         if e.data == "true":
             self.list.set_indicator_opacity(self, 1.0)
         self.card_item.elevation = 20 if e.data == "true" else 1
-        self.list.page.update()
+        render.invalidate(self.list.page, self.card_item)
 
+    @instrumentation.traced(category="ui")
     def drag_leave(self, e):
         self.list.set_indicator_opacity(self, 0.0)
         self.card_item.elevation = 1
-        self.list.page.update()
\ No newline at end of file
+        render.invalidate(self.list.page, self.card_item)
\ No newline at end of file
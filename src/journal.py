@@ -0,0 +1,51 @@
+import json
+import os
+
+import instrumentation
+import metrics
+
+
+class Journal:
+    # Write-ahead log em formato JSON Lines: cada mutação do store ocupa uma
+    # linha, pelo que o custo de escrita depende do tamanho da alteração e não
+    # do tamanho da base de dados.
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.length = 0
+
+    def read(self) -> list[dict]:
+        records = []
+        if not os.path.exists(self.filename):
+            return records
+        good_offset = 0
+        with open(self.filename, "rb") as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # Linha incompleta (escrita interrompida): descarta o resto
+                    break
+                good_offset += len(line)
+        if good_offset != os.path.getsize(self.filename):
+            with open(self.filename, "r+b") as file:
+                file.truncate(good_offset)
+        self.length = len(records)
+        return records
+
+    @instrumentation.traced("Journal.append", "io")
+    def append(self, records: list[dict]):
+        if not records:
+            return
+        payload = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records).encode("utf-8")
+        with open(self.filename, "ab") as file:
+            file.write(payload)
+            file.flush()
+            os.fsync(file.fileno())
+        self.length += len(records)
+        instrumentation.add_bytes("Journal.append", len(payload))
+        metrics.STORE_BYTES_WRITTEN.inc(len(payload), kind="journal")
+
+    def truncate(self):
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+        self.length = 0
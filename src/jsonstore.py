@@ -1,5 +1,8 @@
-import json
+import copy
+import logging
 import os
+import threading
+from contextlib import contextmanager
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -8,14 +11,48 @@ if TYPE_CHECKING:
     from user import User
     from item import Item
 
-from data_store import DataStore
-from board import Board
+from data_store import ITEM_FIELDS, BoardSummary, DataStore
+import instrumentation
+from journal import Journal
+import metrics
+import snapshot
 from user import User
 
+logger = logging.getLogger(__name__)
+
+
 class JSONStore(DataStore):
-    def __init__(self, filename="data.json", app=None, page=None):
+    def __init__(self, filename="data.json", app=None, page=None, journal=False, compact_every=500,
+                 write_behind=False, write_delay=0.5, snapshot_format="json"):
+        super().__init__()
         self.filename = filename
+        # "json" (legível) ou "binary" (snapshot.py, mais pequeno e rápido de
+        # carregar); na leitura o formato é detetado pelo cabeçalho
+        if snapshot_format not in snapshot.FORMATS:
+            raise ValueError(f"Formato desconhecido: {snapshot_format}")
+        self.snapshot_format = snapshot_format
+        # Em modo journal as mutações são acrescentadas a "<filename>.journal"
+        # e o snapshot só é reescrito a cada `compact_every` registos.
+        self.journal = Journal(f"{filename}.journal") if journal else None
+        self.compact_every = compact_every
+        # Em modo write-behind as mutações só marcam o store como sujo; uma
+        # thread de escrita junta as que chegam em `write_delay` segundos numa
+        # única gravação, fora da thread do handler.
+        self.write_behind = write_behind
+        self.write_delay = write_delay
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._writer = None
+        self._writer_cond = threading.Condition()
+        self._write_requested = False
+        self._closed = False
+        self._depth = 0
+        self._pending = []
+        self._dirty = False
         self.data = self._load_data()
+        self._build_indexes()
+        self._replay_journal()
+        self._renumber_duplicate_ids()
         self.current_user = None
         self.app = app
         self.page = page
@@ -23,27 +60,272 @@ class JSONStore(DataStore):
 
     def _load_data(self):
         if os.path.exists(self.filename):
-            with open(self.filename, "r") as file:
-                return json.load(file)
+            return snapshot.load(self.filename)
         return {"users": []}
 
+    @instrumentation.traced(category="io")
     def _save_data(self):
-        with open(self.filename, "w") as file:
-            json.dump(self.data, file, indent=4)
+        # Serializa com o lock (nenhuma mutação a meio) e escreve fora dele
+        with self._write_lock, metrics.STORE_SAVE_SECONDS.time():
+            with self._lock:
+                payload = snapshot.encode(self.data, self.snapshot_format)
+            snapshot.write_atomic(self.filename, payload)
+        metrics.STORE_FILE_BYTES.set(len(payload))
+
+    def _request_write(self):
+        with self._writer_cond:
+            if self._closed:
+                self._save_data()
+                return
+            self._write_requested = True
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_behind_loop, name="jsonstore-writer", daemon=True)
+                self._writer.start()
+            self._writer_cond.notify()
+
+    def _write_behind_loop(self):
+        while True:
+            with self._writer_cond:
+                while not self._write_requested and not self._closed:
+                    self._writer_cond.wait()
+                if not self._write_requested:
+                    return
+                # Debounce: as mutações que chegarem entretanto vão na mesma
+                # escrita (close() acorda a thread para gravar já)
+                self._writer_cond.wait_for(lambda: self._closed, timeout=self.write_delay)
+                self._write_requested = False
+            self._save_data()
+
+    def flush(self):
+        # Grava já o que estiver pendente na thread de escrita
+        with self._writer_cond:
+            requested, self._write_requested = self._write_requested, False
+        if requested:
+            self._save_data()
+
+    def close(self):
+        with self._writer_cond:
+            self._closed = True
+            self._writer_cond.notify_all()
+        if self._writer is not None and self._writer is not threading.current_thread():
+            self._writer.join()
+        self.flush()
+
+    def _replay_journal(self):
+        if self.journal is None:
+            return
+        snapshot_seq = self.data.get("journal_seq", 0)
+        for record in self.journal.read():
+            # Registos já incluídos no snapshot (compactação interrompida antes
+            # de limpar o journal) não podem ser aplicados duas vezes.
+            if record["seq"] > snapshot_seq:
+                self._apply(record)
+                self.data["journal_seq"] = record["seq"]
+
+    def _renumber_duplicate_ids(self):
+        # Ficheiros antigos (ids gerados por contadores do processo que
+        # recomeçavam a cada arranque) podem ter boards e listas repetidos no
+        # mesmo utilizador ou itens repetidos na mesma lista. Fica com o id a
+        # primeira ocorrência, que é a que os índices já resolviam.
+        renumbered = sum(self._renumber_user_ids(user) for user in self.data["users"])
+        if renumbered:
+            logger.warning("%d ids repetidos renumerados em %s", renumbered, self.filename)
+            self._build_indexes()
+            self.compact()
+
+    def _renumber_user_ids(self, user) -> int:
+        renumbered = 0
+        board_ids, list_ids = set(), set()
+        for board in user["boards"]:
+            if board["id"] in board_ids:
+                board["id"] = self.allocate_id("board")
+                renumbered += 1
+            board_ids.add(board["id"])
+            for list in board["lists"]:
+                if list["id"] in list_ids:
+                    list["id"] = self.allocate_id("list")
+                    renumbered += 1
+                list_ids.add(list["id"])
+                item_ids = set()
+                for item in list["items"]:
+                    if item["id"] in item_ids:
+                        item["id"] = self.allocate_id("item")
+                        renumbered += 1
+                    item_ids.add(item["id"])
+        return renumbered
+
+    def allocate_id(self, kind: str) -> int:
+        # Os máximos ficam em data["next_ids"] e são gravados com o resto
+        # dos dados; ao carregar nunca ficam abaixo do maior id existente.
+        with self._lock:
+            next_ids = self.data.setdefault("next_ids", {})
+            new_id = next_ids.get(kind, 1)
+            next_ids[kind] = new_id + 1
+            return new_id
+
+    def _reserve_id(self, kind: str, id: int):
+        next_ids = self.data.setdefault("next_ids", {})
+        if id >= next_ids.get(kind, 1):
+            next_ids[kind] = id + 1
+
+    def compact(self):
+        self._save_data()
+        if self.journal is not None:
+            self.journal.truncate()
+
+    @contextmanager
+    def transaction(self):
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self._flush()
+
+    def _commit(self, op: str, **args):
+        record = {"op": op, **args}
+        with self._lock:
+            # O journal só é escrito no fim da transação e os dicts do registo
+            # passam a fazer parte de self.data: guarda-se uma cópia feita
+            # antes de aplicar, senão as mutações seguintes entravam nela
+            entry = copy.deepcopy(record) if self.journal is not None else None
+            self._apply(record)
+            if entry is None:
+                self._dirty = True
+            else:
+                entry["seq"] = record["seq"] = self.data["journal_seq"] = self.data.get("journal_seq", 0) + 1
+                self._pending.append(entry)
+        metrics.STORE_MUTATIONS.inc(op=op)
+        self._emit_record(record)
+        if self._depth == 0:
+            self._flush()
+
+    def _flush(self):
+        if self.journal is None:
+            if self._dirty:
+                self._dirty = False
+                if self.write_behind:
+                    self._request_write()
+                else:
+                    self._save_data()
+            return
+        with self._lock:
+            records, self._pending = self._pending, []
+        self.journal.append(records)
+        if self.journal.length >= self.compact_every:
+            self.compact()
+
+    def _apply(self, record: dict):
+        getattr(self, f"_apply_{record['op']}")(record)
+
+    def _emit_record(self, record: dict):
+        action, kind = record["op"].split("_", 1)
+        if kind == "user":
+            self._emit(kind, action, user=record["name"])
+            return
+        list_id = record["list"]["id"] if "list" in record else record.get("list_id")
+        board_id = record["board"]["id"] if "board" in record else record.get("board_id")
+        if board_id is None:
+            board_id = self._list_boards.get((record["user"], list_id))
+        item_id = record["item"]["id"] if "item" in record else record.get("item_id")
+        self._emit(kind, action, user=record["user"], board_id=board_id, list_id=list_id, item_id=item_id)
+
+    def _build_indexes(self):
+        # Índices em memória para lookups O(1):
+        #   _users: nome -> user
+        #   _boards: (user, board_id) -> board
+        #   _lists: (user, list_id) -> list
+        #   _list_boards: (user, list_id) -> board_id
+        #   _items: (user, list_id, item_id) -> posição em list["items"]
+        # Em caso de ids repetidos prevalece o primeiro, tal como nos
+        # antigos lookups lineares.
+        self._users = {}
+        self._boards = {}
+        self._lists = {}
+        self._list_boards = {}
+        self._items = {}
+        for user in self.data["users"]:
+            self._index_user(user)
+
+    def _index_user(self, user):
+        self._users.setdefault(user["name"], user)
+        for board in user["boards"]:
+            self._index_board(user["name"], board)
+
+    def _unindex_user(self, user):
+        if self._users.get(user["name"]) is user:
+            del self._users[user["name"]]
+        for board in user["boards"]:
+            self._unindex_board(user["name"], board)
+
+    def _index_board(self, user_name, board):
+        self._reserve_id("board", board["id"])
+        self._boards.setdefault((user_name, board["id"]), board)
+        for list in board["lists"]:
+            self._index_list(user_name, board, list)
+
+    def _unindex_board(self, user_name, board):
+        if self._boards.get((user_name, board["id"])) is board:
+            del self._boards[(user_name, board["id"])]
+        for list in board["lists"]:
+            self._unindex_list(user_name, list)
+
+    def _index_list(self, user_name, board, list):
+        self._reserve_id("list", list["id"])
+        current = self._lists.get((user_name, list["id"]))
+        if current is None:
+            self._lists[(user_name, list["id"])] = list
+            self._list_boards[(user_name, list["id"])] = board["id"]
+            self._index_items(user_name, list)
+        elif current is not list:
+            self._reindex_list_id(user_name, list["id"])
+
+    def _unindex_list(self, user_name, list):
+        if self._lists.get((user_name, list["id"])) is list:
+            self._reindex_list_id(user_name, list["id"])
+
+    def _reindex_list_id(self, user_name, list_id):
+        # Só acontece com ids de lista repetidos: indexa sempre a primeira
+        # lista com esse id pela ordem dos boards, para que o replay do
+        # journal e o estado em memória escolham a mesma lista.
+        current = self._lists.pop((user_name, list_id), None)
+        self._list_boards.pop((user_name, list_id), None)
+        if current is not None:
+            for item in current["items"]:
+                self._items.pop((user_name, list_id, item["id"]), None)
+        user = self._users.get(user_name)
+        if user:
+            for board in user["boards"]:
+                for list in board["lists"]:
+                    if list["id"] == list_id:
+                        self._lists[(user_name, list_id)] = list
+                        self._list_boards[(user_name, list_id)] = board["id"]
+                        self._index_items(user_name, list)
+                        return
+
+    def _index_items(self, user_name, list):
+        for position, item in enumerate(list["items"]):
+            self._reserve_id("item", item["id"])
+            self._items.setdefault((user_name, list["id"], item["id"]), position)
+
+    def _get_list(self, user_name, list_id):
+        return self._lists.get((user_name, list_id))
 
     def ensure_admin_user(self):
         admin_user = self.get_user("admin")
         if not admin_user:
             admin_user = User("admin", "admin")
             self.add_user(admin_user)
-            print("Usuário admin criado com sucesso.")
+            logger.info("Usuário admin criado com sucesso.")
 
     def set_current_user(self, user):
         self.current_user = user
         if user is not None:
-            print(f"Usuário definido: {user['name']}")
+            logger.info("Usuário definido: %s", user["name"])
         else:
-            print("Usuário removido (logout)")
+            logger.info("Usuário removido (logout)")
+        self._emit("user", "login", user=user["name"] if user else None)
 
     def _get_current_user(self):
         if self.current_user:
@@ -53,158 +335,236 @@ class JSONStore(DataStore):
             user = self.get_user(current_user_name)
             if user:
                 self.current_user = user
-                print(f"Usuário recuperado do client_storage: {user['name']}")
+                logger.info("Usuário recuperado do client_storage: %s", user["name"])
                 return user
         return None
 
-    def _get_next_board_id(self):
-        user = self._get_current_user()
-        if user and user["boards"]:
-            return max(b["id"] for b in user["boards"]) + 1
-        return 1
-
     def add_board(self, board: "Board"):
         user = self._get_current_user()
         if user:
-            new_id = self._get_next_board_id()
-            board.board_id = new_id
-            print(f"Adicionando board '{board.name}' para o usuário '{user['name']}'")
-            user["boards"].append({
+            if getattr(board, "board_id", None) is None or (user["name"], board.board_id) in self._boards:
+                board.board_id = self.allocate_id("board")
+            logger.debug("Adicionando board '%s' para o usuário '%s'", board.name, user["name"])
+            self._commit("add_board", user=user["name"], board={
                 "id": board.board_id,
                 "name": board.name,
                 "lists": []
             })
-            self._save_data()
+
+    def _apply_add_board(self, record):
+        user = self.get_user(record["user"])
+        if user:
+            user["boards"].append(record["board"])
+            self._index_board(user["name"], record["board"])
 
     def get_board(self, id: int):
+        # Só o board aberto constrói a árvore de controlos
+        from board import Board
+
         user = self._get_current_user()
         if user:
-            for board_data in user["boards"]:
-                if board_data["id"] == id:
-                    return Board(
-                        self.app,
-                        self,
-                        board_data["name"],
-                        self.page,
-                        board_id=board_data["id"],
-                        lists=board_data["lists"]
-                    )
+            board_data = self._boards.get((user["name"], id))
+            if board_data:
+                return Board(
+                    self.app,
+                    self,
+                    board_data["name"],
+                    self.page,
+                    board_id=board_data["id"],
+                    lists=board_data["lists"]
+                )
         return None
 
     def get_boards(self):
         user = self._get_current_user()
         if user and self.app and self.page:
-            return [
-                Board(
-                    self.app,
-                    self,
-                    b["name"],
-                    self.page,
-                    board_id=b["id"],
-                    lists=b["lists"]
-                )
-                for b in user["boards"]
-            ]
+            return [self.get_board(b["id"]) for b in user["boards"]]
+        return []
+
+    def _summarize(self, board_data):
+        return BoardSummary(
+            board_data["id"],
+            board_data["name"],
+            list_count=len(board_data["lists"]),
+            item_count=sum(len(l["items"]) for l in board_data["lists"]),
+        )
+
+    def get_board_summaries(self):
+        user = self._get_current_user()
+        if user:
+            return [self._summarize(b) for b in user["boards"]]
         return []
 
+    def get_board_summary(self, id: int):
+        user = self._get_current_user()
+        if user:
+            board_data = self._boards.get((user["name"], id))
+            if board_data:
+                return self._summarize(board_data)
+        return None
+
     def update_board(self, board: "Board", update: dict):
         user = self._get_current_user()
         if user:
-            for b in user["boards"]:
-                if b["id"] == board.board_id:
-                    b.update(update)
-                    board.name = update.get("name", board.name)
-                    self._save_data()
-                    print(f"Board atualizado: {b['name']}")
-                    break
+            b = self._boards.get((user["name"], board.board_id))
+            if b:
+                self._commit("update_board", user=user["name"], board_id=board.board_id, update=update)
+                board.name = update.get("name", board.name)
+                logger.debug("Board atualizado: %s", b["name"])
+
+    def _apply_update_board(self, record):
+        b = self._boards.get((record["user"], record["board_id"]))
+        if b:
+            b.update(record["update"])
 
     def remove_board(self, board: "Board"):
         user = self._get_current_user()
         if user:
-            user["boards"] = [b for b in user["boards"] if b["id"] != board.board_id]
-            self._save_data()
+            self._commit("remove_board", user=user["name"], board_id=board.board_id)
+
+    def _apply_remove_board(self, record):
+        user = self.get_user(record["user"])
+        if user:
+            removed = [b for b in user["boards"] if b["id"] == record["board_id"]]
+            user["boards"] = [b for b in user["boards"] if b["id"] != record["board_id"]]
+            for b in removed:
+                self._unindex_board(user["name"], b)
 
     def add_list(self, board_id: int, list: "BoardList"):
         user = self._get_current_user()
         if user:
-            for board in user["boards"]:
-                if board["id"] == board_id:
-                    if not any(l["id"] == list.board_list_id for l in board["lists"]):
-                        board["lists"].append({
-                            "id": list.board_list_id,
-                            "title": list.title,
-                            "color": list.color,
-                            "items": []
-                        })
-                        self._save_data()
+            board = self._boards.get((user["name"], board_id))
+            if board and self._get_list(user["name"], list.board_list_id) is None:
+                self._commit("add_list", user=user["name"], board_id=board_id, list={
+                    "id": list.board_list_id,
+                    "title": list.title,
+                    "color": list.color,
+                    "items": []
+                })
+
+    def _apply_add_list(self, record):
+        board = self._boards.get((record["user"], record["board_id"]))
+        # Journals antigos podem repetir ids de outros boards: esses registos
+        # continuam a ser aplicados e são renumerados depois do replay
+        if board and not any(l["id"] == record["list"]["id"] for l in board["lists"]):
+            board["lists"].append(record["list"])
+            self._index_list(record["user"], board, record["list"])
 
     def get_lists_by_board(self, board_id: int):
         user = self._get_current_user()
         if user:
-            for board in user["boards"]:
-                if board["id"] == board_id:
-                    return board["lists"]
+            board = self._boards.get((user["name"], board_id))
+            if board:
+                return board["lists"]
         return []
 
     def remove_list(self, board_id: int, list_id: int):
         user = self._get_current_user()
         if user:
-            for board in user["boards"]:
-                if board["id"] == board_id:
-                    board["lists"] = [l for l in board["lists"] if l["id"] != list_id]
-                    self._save_data()
+            if (user["name"], board_id) in self._boards:
+                self._commit("remove_list", user=user["name"], board_id=board_id, list_id=list_id)
+
+    def _apply_remove_list(self, record):
+        board = self._boards.get((record["user"], record["board_id"]))
+        if board:
+            removed = [l for l in board["lists"] if l["id"] == record["list_id"]]
+            board["lists"] = [l for l in board["lists"] if l["id"] != record["list_id"]]
+            for l in removed:
+                self._unindex_list(record["user"], l)
 
-    def add_item(self, list_id: int, item: "Item"):
+    def add_item(self, list_id: int, item: "Item", index: int | None = None):
         user = self._get_current_user()
         if user:
-            for board in user["boards"]:
-                for list in board["lists"]:
-                    if list["id"] == list_id:
-                        list["items"].append({
-                            "id": item.item_id,
-                            "item_text": item.item_text,
-                            "priority": item.priority,
-                            "description": item.description,
-                            "tags": item.tags,  # Adiciona as tags ao JSON
-                            "completed": item.completed
-                        })
-                        self._save_data()
+            if self._get_list(user["name"], list_id):
+                position = {"index": index} if index is not None else {}
+                self._commit("add_item", user=user["name"], list_id=list_id, item={
+                    "id": item.item_id,
+                    "item_text": item.item_text,
+                    "priority": item.priority,
+                    "description": item.description,
+                    "tags": item.tags,  # Adiciona as tags ao JSON
+                    "completed": item.completed
+                }, **position)
+
+    def _apply_add_item(self, record):
+        list = self._get_list(record["user"], record["list_id"])
+        if list:
+            self._reserve_id("item", record["item"]["id"])
+            index = record.get("index")
+            if index is None or index >= len(list["items"]):
+                list["items"].append(record["item"])
+                self._items.setdefault(
+                    (record["user"], record["list_id"], record["item"]["id"]), len(list["items"]) - 1
+                )
+            else:
+                # As posições dos itens seguintes mudam: reindexa a lista
+                for item in list["items"]:
+                    self._items.pop((record["user"], list["id"], item["id"]), None)
+                list["items"].insert(index, record["item"])
+                self._index_items(record["user"], list)
 
     def get_items(self, list_id: int):
         user = self._get_current_user()
         if user:
-            for board in user["boards"]:
-                for list in board["lists"]:
-                    if list["id"] == list_id:
-                        return list["items"]
+            list = self._get_list(user["name"], list_id)
+            if list:
+                return list["items"]
         return []
 
+    def update_item(self, list_id: int, item_id: int, fields: dict):
+        # Altera o item no sítio: mantém a posição na lista e escreve uma vez
+        user = self._get_current_user()
+        if user:
+            if (user["name"], list_id, item_id) in self._items:
+                fields = {k: v for k, v in fields.items() if k in ITEM_FIELDS}
+                self._commit("update_item", user=user["name"], list_id=list_id, item_id=item_id, fields=fields)
+
+    def _apply_update_item(self, record):
+        position = self._items.get((record["user"], record["list_id"], record["item_id"]))
+        if position is not None:
+            self._lists[(record["user"], record["list_id"])]["items"][position].update(record["fields"])
+
     def remove_item(self, list_id: int, item_id: int):
         user = self._get_current_user()
         if user:
-            for board in user["boards"]:
-                for list in board["lists"]:
-                    if list["id"] == list_id:
-                        list["items"] = [i for i in list["items"] if i["id"] != item_id]
-                        self._save_data()
+            if (user["name"], list_id, item_id) in self._items:
+                self._commit("remove_item", user=user["name"], list_id=list_id, item_id=item_id)
+
+    def _apply_remove_item(self, record):
+        list = self._get_list(record["user"], record["list_id"])
+        if list and (record["user"], record["list_id"], record["item_id"]) in self._items:
+            for item in list["items"]:
+                self._items.pop((record["user"], list["id"], item["id"]), None)
+            list["items"] = [i for i in list["items"] if i["id"] != record["item_id"]]
+            self._index_items(record["user"], list)
 
     def add_user(self, user: "User"):
-        self.data["users"].append({
-            "name": user.name,
-            "password": user.password,
+        self._commit("add_user", name=user.name, password=user.password)
+
+    def _apply_add_user(self, record):
+        user = {
+            "name": record["name"],
+            "password": record["password"],
             "boards": []
-        })
-        self._save_data()
+        }
+        self.data["users"].append(user)
+        self._index_user(user)
 
     def get_users(self):
         return self.data["users"]
 
+    def get_board_count(self, name: str) -> int:
+        user = self._users.get(name)
+        return len(user["boards"]) if user else 0
+
     def get_user(self, name: str):
-        for user in self.data["users"]:
-            if user["name"] == name:
-                return user
-        return None
+        return self._users.get(name)
 
     def remove_user(self, name: str):
-        self.data["users"] = [u for u in self.data["users"] if u["name"] != name]
-        self._save_data()
\ No newline at end of file
+        self._commit("remove_user", name=name)
+
+    def _apply_remove_user(self, record):
+        removed = [u for u in self.data["users"] if u["name"] == record["name"]]
+        self.data["users"] = [u for u in self.data["users"] if u["name"] != record["name"]]
+        for user in removed:
+            self._unindex_user(user)
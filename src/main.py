@@ -1,13 +1,28 @@
+import atexit
+import logging
 import os
 import flet as ft
 from app_layout import AppLayout
 from board import Board
 from user import User
-from data_store import DataStore
+from data_store import BoardSummary, DataStore
+import instrumentation
+import metrics
 from jsonstore import JSONStore
+from sharded_store import ShardedJSONStore
+from sqlite_store import SQLiteStore
+import snapshot
+from store_service import StoreService, data_lock_filename
+import tagging
 
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
+# TROLLI_LOG_LEVEL=INFO (ou DEBUG) mostra as mensagens do store e da UI
+logging.basicConfig(
+    level=os.environ.get("TROLLI_LOG_LEVEL", "WARNING").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+
 class TrelloApp(AppLayout):
     def __init__(self, page: ft.Page, store: DataStore):
         self.page = page
@@ -31,6 +46,11 @@ class TrelloApp(AppLayout):
             ),
         ]
 
+        self.menu_container = ft.Container(
+            content=ft.PopupMenuButton(items=self.appbar_items),
+            margin=ft.margin.only(left=50, right=25),
+        )
+
         self.appbar = ft.AppBar(
             leading=ft.Icon(ft.Icons.GRID_GOLDENRATIO_ROUNDED),
             leading_width=100,
@@ -42,12 +62,7 @@ class TrelloApp(AppLayout):
             ),
             center_title=False,
             toolbar_height=75,
-            actions=[
-                ft.Container(
-                    content=ft.PopupMenuButton(items=self.appbar_items),
-                    margin=ft.margin.only(left=50, right=25),
-                )
-            ],
+            actions=[self.menu_container],
         )
 
         super().__init__(
@@ -66,6 +81,7 @@ class TrelloApp(AppLayout):
         self.page.theme.page_transitions.windows = "cupertino"
         self.page.fonts = {"Pacifico": "Pacifico-Regular.ttf"}
         self.page.on_route_change = self.route_change
+        self.appbar.actions.insert(0, ft.Container(content=self.search_field, alignment=ft.alignment.center))
         self.page.appbar = self.appbar
 
         self.update_theme_colors()  # Aplica as cores iniciais com base no tema
@@ -85,11 +101,12 @@ class TrelloApp(AppLayout):
         for view in self.page.views: 
             view.bgcolor = self.page.bgcolor
 
-        # Atualiza apenas listas válidas com page definido
-        for board in self.store.get_boards():
-            for list_control in board.board_lists.controls[:-1]:  
-                if hasattr(list_control, 'page') and list_control.page is not None:
-                    list_control.update_theme()
+        # Boards em cache foram construídos com as cores do tema anterior
+        self.board_cache.clear()
+        # Só o board aberto tem listas montadas na página
+        if isinstance(self.active_view, Board):
+            for list_control in self.active_view.board_lists.controls[:-1]:
+                list_control.update_theme()
         self.page.update()
 
     def toggle_theme(self, e):
@@ -115,7 +132,7 @@ class TrelloApp(AppLayout):
                 on_click=self.toggle_theme
             ),
         ]
-        self.appbar.actions[0].content = ft.PopupMenuButton(items=self.appbar_items)
+        self.menu_container.content = ft.PopupMenuButton(items=self.appbar_items)
         self.page.views.clear()
         self.page.views.append(
             ft.View(
@@ -150,7 +167,7 @@ class TrelloApp(AppLayout):
                 self.user = user_name.value
                 self.page.client_storage.set("current_user", user_name.value)
                 self.store.set_current_user(user)
-                self.boards = self.store.get_boards()
+                self.boards = self.store.get_board_summaries()
                 self.page.close(dialog)
                 self.appbar_items = [
                     ft.PopupMenuItem(content=ft.Text(f"{self.user}'s Profile")),
@@ -161,7 +178,7 @@ class TrelloApp(AppLayout):
                     ),
                     ft.PopupMenuItem(text="Close App", on_click=self.close_app),  # Novo botão
                 ]
-                self.appbar.actions[0].content = ft.PopupMenuButton(items=self.appbar_items)
+                self.menu_container.content = ft.PopupMenuButton(items=self.appbar_items)
                 self.page.views.clear()
                 self.page.views.append(
                     ft.View(
@@ -233,6 +250,7 @@ class TrelloApp(AppLayout):
         self.page.open(dialog)
 
     def close_app(self, e):
+        self.store.close()  # Grava as escritas pendentes antes de sair
         self.page.window.close()  # Fecha a janela do aplicativo
 
     def route_change(self, e):
@@ -248,7 +266,7 @@ class TrelloApp(AppLayout):
         if troute.match("/"):
             self.page.route = "/boards"
         elif troute.match("/board/:id"):
-            if int(troute.id) >= len(self.store.get_boards()):
+            if int(troute.id) >= len(self.store.get_board_summaries()):
                 self.page.route = "/boards"
             else:
                 self.set_board_view(int(troute.id))
@@ -309,23 +327,76 @@ class TrelloApp(AppLayout):
         dialog_text.focus()
 
     def create_new_board(self, board_name):
-        new_board = Board(self, self.store, board_name, self.page)
+        new_board = BoardSummary(None, board_name)
         self.store.add_board(new_board)
-        self.boards = self.store.get_boards()
-        self.hydrate_all_boards_view()
-        self.sidebar.sync_board_destinations()
+        self.boards = self.store.get_board_summaries()
 
     def delete_board(self, e):
         self.store.remove_board(e.control.data)
-        self.boards = self.store.get_boards()
+        self.boards = self.store.get_board_summaries()
         self.set_all_boards_view()
-        self.sidebar.sync_board_destinations()
+
+def create_store(page: ft.Page) -> DataStore:
+    # TROLLI_STORE=sqlite usa data.db (importando o data.json na primeira execução)
+    if os.environ.get("TROLLI_STORE") == "sqlite":
+        return SQLiteStore(app=None, page=page, import_from="data.json")
+    # TROLLI_STORE=sharded usa data/users.json + um ficheiro por utilizador
+    if os.environ.get("TROLLI_STORE") == "sharded":
+        return ShardedJSONStore(
+            app=None,
+            page=page,
+            write_behind=os.environ.get("TROLLI_WRITE_BEHIND") == "1",
+            snapshot_format=os.environ.get("TROLLI_SNAPSHOT", "json"),
+            import_from="data.json",
+        )
+    # TROLLI_JOURNAL=1 ativa o journal append-only em vez de reescrever o data.json
+    # TROLLI_WRITE_BEHIND=1 grava o data.json em segundo plano (com debounce)
+    # TROLLI_SNAPSHOT=binary usa data.snapshot (convertido do data.json na primeira execução)
+    filename = "data.json"
+    snapshot_format = os.environ.get("TROLLI_SNAPSHOT", "json")
+    if snapshot_format == "binary":
+        filename = "data.snapshot"
+        if not os.path.exists(filename) and os.path.exists("data.json"):
+            snapshot.convert("data.json", filename, "binary")
+    return JSONStore(
+        filename,
+        app=None,
+        page=page,
+        journal=os.environ.get("TROLLI_JOURNAL") == "1",
+        write_behind=os.environ.get("TROLLI_WRITE_BEHIND") == "1",
+        snapshot_format=snapshot_format,
+    )
+
+service = None
+
+def get_store_service() -> StoreService:
+    # Um só store por processo, partilhado por todas as sessões (no modo web
+    # cada browser é uma sessão com o seu utilizador)
+    global service
+    if service is None:
+        backend = create_store(None)
+        service = StoreService(backend, lock_filename=data_lock_filename(backend))
+        # A cache de sugestões de tags fica junto ao ficheiro de dados
+        tagging.configure_cache(os.path.join(os.path.dirname(os.path.abspath(backend.filename)), "tag_cache.json"))
+        metrics.SESSIONS_ACTIVE.set_function(lambda: len(service.sessions))
+        # TROLLI_METRICS_PORT=9100 expõe /metrics (Prometheus) em 127.0.0.1
+        if os.environ.get("TROLLI_METRICS_PORT"):
+            metrics.start_server(int(os.environ["TROLLI_METRICS_PORT"]))
+        # Com TROLLI_TRACE=1 grava o trace à saída; o atexit corre por ordem
+        # inversa, pelo que inclui as escritas feitas por service.close
+        atexit.register(instrumentation.dump_chrome_trace)
+        # Sem isto as escritas ainda em debounce perdiam-se ao sair
+        atexit.register(service.close)
+    return service
 
 def main(page: ft.Page):
-    store = JSONStore(app=None, page=page)
+    store = get_store_service().open_session(page)
     app = TrelloApp(page, store)
     store.app = app
+    page.on_close = lambda e: store.close()
     page.add(app)
+    # Carrega os modelos NLP em segundo plano depois do primeiro frame
+    tagging.prewarm()
 
 ft.app(target=main, assets_dir="../assets")
 #ft.app(target=main, view=ft.WEB_BROWSER, host="0.0.0.0", port=3000, assets_dir="../assets")
\ No newline at end of file
@@ -6,18 +6,33 @@ if TYPE_CHECKING:
     from user import User
     from item import Item
 
-from data_store import DataStore
+from data_store import ITEM_FIELDS, BoardSummary, DataStore
 
 
 class InMemoryStore(DataStore):
     def __init__(self):
+        super().__init__()
         self.boards: dict[int, "Board"] = {}
         self.users: dict[str, "User"] = {}
         self.board_lists: dict[int, list["BoardList"]] = {}
         self.items: dict[int, list["Item"]] = {}
+        self.next_ids: dict[str, int] = {}
+
+    def allocate_id(self, kind: str) -> int:
+        new_id = self.next_ids.get(kind, 1)
+        self.next_ids[kind] = new_id + 1
+        return new_id
+
+    def _reserve_id(self, kind: str, id: int):
+        if id >= self.next_ids.get(kind, 1):
+            self.next_ids[kind] = id + 1
 
     def add_board(self, board: "Board"):
+        if board.board_id is None:
+            board.board_id = self.allocate_id("board")
+        self._reserve_id("board", board.board_id)
         self.boards[board.board_id] = board
+        self._emit("board", "add", board_id=board.board_id)
 
     def get_board(self, id: int):
         return self.boards[id]
@@ -25,19 +40,34 @@ class InMemoryStore(DataStore):
     def update_board(self, board: "Board", update: dict):
         for k in update:
             setattr(board, k, update[k])
+        self._emit("board", "update", board_id=board.board_id)
 
     def get_boards(self):
         return [self.boards[b] for b in self.boards]
 
+    def get_board_summaries(self):
+        return [
+            BoardSummary(
+                b.board_id,
+                b.name,
+                list_count=len(self.board_lists.get(b.board_id, [])),
+                item_count=sum(len(self.items.get(l.board_list_id, [])) for l in self.board_lists.get(b.board_id, [])),
+            )
+            for b in self.boards.values()
+        ]
+
     def remove_board(self, board: "Board"):
         del self.boards[board.board_id]
         self.board_lists[board.board_id] = []
+        self._emit("board", "remove", board_id=board.board_id)
 
     def add_list(self, board: int, list: "BoardList"):
+        self._reserve_id("list", list.board_list_id)
         if board in self.board_lists:
             self.board_lists[board].append(list)
         else:
             self.board_lists[board] = [list]
+        self._emit("list", "add", board_id=board, list_id=list.board_list_id)
 
     def get_lists_by_board(self, board: int):
         return self.board_lists.get(board, [])
@@ -46,23 +76,48 @@ class InMemoryStore(DataStore):
         self.board_lists[board] = [
             l for l in self.board_lists[board] if not l.board_list_id == id
         ]
+        self._emit("list", "remove", board_id=board, list_id=id)
 
     def add_user(self, user: "User"):
         self.users[user.name] = user
+        self._emit("user", "add", user=user.name)
+
+    def get_board_count(self, name: str) -> int:
+        # Os boards deste store não têm dono: todos os utilizadores os veem
+        return len(self.boards) if name in self.users else 0
 
     def get_users(self):
         return [self.users[u] for u in self.users]
 
-    def add_item(self, board_list: int, item: "Item"):
-        if board_list in self.items:
-            self.items[board_list].append(item)
+    def add_item(self, board_list: int, item: "Item", index: int | None = None):
+        self._reserve_id("item", item.item_id)
+        items = self.items.setdefault(board_list, [])
+        if index is None:
+            items.append(item)
         else:
-            self.items[board_list] = [item]
+            items.insert(index, item)
+        self._emit("item", "add", board_id=self._board_of(board_list), list_id=board_list, item_id=item.item_id)
 
     def get_items(self, board_list: int):
         return self.items.get(board_list, [])
 
+    def update_item(self, board_list: int, id: int, fields: dict):
+        for item in self.items.get(board_list, []):
+            if item.item_id == id:
+                for k in fields:
+                    if k in ITEM_FIELDS:
+                        setattr(item, k, fields[k])
+                self._emit("item", "update", board_id=self._board_of(board_list), list_id=board_list, item_id=id)
+                break
+
     def remove_item(self, board_list: int, id: int):
         self.items[board_list] = [
             i for i in self.items[board_list] if not i.item_id == id
         ]
+        self._emit("item", "remove", board_id=self._board_of(board_list), list_id=board_list, item_id=id)
+
+    def _board_of(self, board_list: int):
+        for board_id, lists in self.board_lists.items():
+            if any(l.board_list_id == board_list for l in lists):
+                return board_id
+        return None
@@ -0,0 +1,78 @@
+import threading
+import weakref
+
+import flet as ft
+
+# Intervalo (em segundos) durante o qual as invalidações são juntadas antes de
+# serem enviadas; os eventos de drag chegam a cada movimento do ponteiro.
+FRAME_INTERVAL = 1 / 60
+
+
+class RenderScheduler:
+    # Junta os controlos marcados como sujos pelos handlers e envia-os num só
+    # page.update(*controls), em vez de fazer o Flet comparar a árvore inteira
+    # da página em cada evento.
+    def __init__(self, page: ft.Page, interval: float = FRAME_INTERVAL):
+        self.page = page
+        self.interval = interval
+        self._dirty: dict[int, ft.Control] = {}
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def invalidate(self, *controls: ft.Control):
+        with self._lock:
+            for control in controls:
+                self._dirty[id(control)] = control
+            if self._timer is None and self._dirty:
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            controls = list(self._dirty.values())
+            self._dirty.clear()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        # Controlos ainda não montados não têm uid; os que têm um antepassado
+        # também sujo já são enviados com ele.
+        dirty = {id(control) for control in controls}
+        controls = [
+            control for control in controls
+            if control.uid is not None and not self._has_dirty_ancestor(control, dirty)
+        ]
+        if controls:
+            self.page.update(*controls)
+
+    def _has_dirty_ancestor(self, control: ft.Control, dirty: set[int]) -> bool:
+        parent = control.parent
+        while parent is not None:
+            if id(parent) in dirty:
+                return True
+            parent = parent.parent
+        return False
+
+
+_schedulers = weakref.WeakKeyDictionary()
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(page: ft.Page) -> RenderScheduler:
+    with _schedulers_lock:
+        scheduler = _schedulers.get(page)
+        if scheduler is None:
+            scheduler = _schedulers[page] = RenderScheduler(page)
+        return scheduler
+
+
+def invalidate(page: ft.Page, *controls: ft.Control):
+    # Marca os controlos para o próximo envio da página
+    if page is not None:
+        get_scheduler(page).invalidate(*controls)
+
+
+def flush(page: ft.Page):
+    # Envia já as invalidações pendentes (ex.: antes de abrir um diálogo)
+    if page is not None:
+        get_scheduler(page).flush()
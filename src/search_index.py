@@ -0,0 +1,186 @@
+import bisect
+import re
+import threading
+import unicodedata
+
+from data_store import DataStore, StoreEvent
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def fold(text: str) -> str:
+    # Minúsculas e sem acentos: "Ação" e "acao" dão o mesmo token
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(fold(text))
+
+
+def _field(obj, key: str, attr: str):
+    # Os stores JSON/SQLite devolvem dicts; o InMemoryStore devolve modelos
+    return obj.get(key) if isinstance(obj, dict) else getattr(obj, attr, None)
+
+
+class SearchHit:
+    def __init__(self, board_id: int, list_id: int, item_id: int, item_text: str, list_title: str = ""):
+        self.board_id = board_id
+        self.list_id = list_id
+        self.item_id = item_id
+        self.item_text = item_text
+        self.list_title = list_title
+
+    def __repr__(self):
+        return f"SearchHit(board_id={self.board_id}, list_id={self.list_id}, item_id={self.item_id}, item_text={self.item_text!r})"
+
+
+class SearchIndex:
+    # Índice invertido (token -> cartões) sobre item_text, description e tags
+    # de todos os boards do utilizador atual. É construído na primeira pesquisa
+    # depois de cada login e mantido pelos eventos do store: cada alteração só
+    # volta a tokenizar os cartões cujo texto mudou.
+    def __init__(self, store: DataStore):
+        self.store = store
+        self._lock = threading.RLock()
+        self._built = False
+        self._postings: dict[str, set[tuple]] = {}
+        self._tokens: list[str] = []  # ordenados, para pesquisa por prefixo
+        self._docs: dict[tuple, tuple] = {}  # chave -> (texto, tokens)
+        self._lists: dict[tuple[int, int], set[tuple]] = {}
+        self._list_titles: dict[tuple[int, int], str] = {}
+        self.store.add_listener(self.on_store_event)
+
+    def clear(self):
+        with self._lock:
+            self._built = False
+            self._postings.clear()
+            self._tokens.clear()
+            self._docs.clear()
+            self._lists.clear()
+            self._list_titles.clear()
+
+    def rebuild(self):
+        with self._lock:
+            self.clear()
+            for summary in self.store.get_board_summaries():
+                self.index_board(summary.board_id)
+            self._built = True
+
+    def index_board(self, board_id: int):
+        for board_list in self.store.get_lists_by_board(board_id):
+            self.index_list(
+                board_id,
+                _field(board_list, "id", "board_list_id"),
+                _field(board_list, "title", "title") or "",
+            )
+
+    def index_list(self, board_id: int, list_id: int, title: str | None = None):
+        # Reconcilia os cartões da lista com o store
+        if title is not None:
+            self._list_titles[(board_id, list_id)] = title
+        keys = self._lists.setdefault((board_id, list_id), set())
+        seen = set()
+        for item in self.store.get_items(list_id):
+            key = (board_id, list_id, _field(item, "id", "item_id"))
+            tags = _field(item, "tags", "tags") or []
+            text = "\n".join([
+                _field(item, "item_text", "item_text") or "",
+                _field(item, "description", "description") or "",
+                " ".join(tags),
+            ])
+            seen.add(key)
+            doc = self._docs.get(key)
+            if doc is not None and doc[0] == text:
+                continue
+            if doc is not None:
+                self._remove_doc(key)
+            self._add_doc(key, text)
+            keys.add(key)
+        for key in keys - seen:
+            self._remove_doc(key)
+        keys &= seen
+
+    def _add_doc(self, key: tuple, text: str):
+        tokens = set(tokenize(text))
+        self._docs[key] = (text, tokens)
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = set()
+                bisect.insort(self._tokens, token)
+            postings.add(key)
+
+    def _remove_doc(self, key: tuple):
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        for token in doc[1]:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.discard(key)
+            if not postings:
+                del self._postings[token]
+                del self._tokens[bisect.bisect_left(self._tokens, token)]
+
+    def drop_list(self, board_id: int, list_id: int):
+        for key in self._lists.pop((board_id, list_id), set()):
+            self._remove_doc(key)
+        self._list_titles.pop((board_id, list_id), None)
+
+    def drop_board(self, board_id: int):
+        for board_list in [k for k in self._lists if k[0] == board_id]:
+            self.drop_list(*board_list)
+
+    def on_store_event(self, event: StoreEvent):
+        with self._lock:
+            if event.kind == "user" and event.action == "login":
+                self.clear()
+                return
+            if not self._built:
+                return
+            user = self.store._get_current_user()
+            if not user or event.user not in (None, user["name"]):
+                return
+            if event.kind == "board" and event.action == "remove":
+                self.drop_board(event.board_id)
+            elif event.kind == "list" and event.action == "remove":
+                self.drop_list(event.board_id, event.list_id)
+            elif event.kind == "list" and event.action == "add":
+                self.index_board(event.board_id)
+            elif event.kind == "item" and event.board_id is not None:
+                self.index_list(event.board_id, event.list_id)
+
+    def _prefix_postings(self, prefix: str) -> set[tuple]:
+        matches = set()
+        i = bisect.bisect_left(self._tokens, prefix)
+        while i < len(self._tokens) and self._tokens[i].startswith(prefix):
+            matches |= self._postings[self._tokens[i]]
+            i += 1
+        return matches
+
+    def search(self, query: str, limit: int = 50) -> list[SearchHit]:
+        # Todos os termos têm de aparecer; cada termo casa por prefixo
+        terms = sorted(set(tokenize(query)), key=len, reverse=True)
+        if not terms:
+            return []
+        with self._lock:
+            if not self._built:
+                self.rebuild()
+            keys = None
+            for term in terms:
+                matches = self._prefix_postings(term)
+                keys = matches if keys is None else keys & matches
+                if not keys:
+                    return []
+            hits = []
+            for key in sorted(keys)[:limit]:
+                hits.append(SearchHit(
+                    key[0],
+                    key[1],
+                    key[2],
+                    self._docs[key][0].split("\n", 1)[0],
+                    self._list_titles.get((key[0], key[1]), ""),
+                ))
+            return hits
@@ -0,0 +1,161 @@
+import logging
+import os
+from urllib.parse import quote
+
+import instrumentation
+from jsonstore import JSONStore
+import metrics
+import snapshot
+
+logger = logging.getLogger(__name__)
+
+SHARD_EXTENSIONS = {"json": ".json", "binary": ".snapshot"}
+
+
+class ShardedJSONStore(JSONStore):
+    # Layout por utilizador dentro de `directory`:
+    #   users.json         diretório pequeno: nome, password, nº de boards e
+    #                      os máximos dos ids (data["next_ids"])
+    #   users/<nome>.json  os boards de um utilizador
+    # Os boards de um utilizador só são lidos quando ele faz login, e cada
+    # gravação reescreve o diretório e apenas os ficheiros dos utilizadores
+    # alterados. Não suporta o modo journal.
+    def __init__(self, directory="data", app=None, page=None, write_behind=False, write_delay=0.5,
+                 snapshot_format="json", import_from=None):
+        self.directory = directory
+        self.import_from = import_from
+        self._loaded = set()
+        self._dirty_shards = set()
+        self._removed_shards = set()
+        # Tamanho em disco de cada shard, para a métrica do tamanho dos dados
+        self._shard_bytes = {}
+        os.makedirs(os.path.join(directory, "users"), exist_ok=True)
+        super().__init__(
+            os.path.join(directory, "users.json"),
+            app=app,
+            page=page,
+            write_behind=write_behind,
+            write_delay=write_delay,
+            snapshot_format=snapshot_format,
+        )
+
+    def _shard_path(self, name: str, format: str | None = None) -> str:
+        extension = SHARD_EXTENSIONS[format or self.snapshot_format]
+        return os.path.join(self.directory, "users", quote(name, safe="") + extension)
+
+    def _load_data(self):
+        if not os.path.exists(self.filename) and self.import_from and os.path.exists(self.import_from):
+            self._split(snapshot.load(self.import_from))
+        data = snapshot.load(self.filename) if os.path.exists(self.filename) else {"users": []}
+        for user in data["users"]:
+            user["boards"] = []
+            path = self._find_shard(user["name"])
+            if path is not None:
+                self._shard_bytes[user["name"]] = os.path.getsize(path)
+        return data
+
+    def _find_shard(self, name: str) -> str | None:
+        # Prefere o formato atual; um shard noutro formato também é lido
+        for format in (self.snapshot_format, *SHARD_EXTENSIONS):
+            path = self._shard_path(name, format)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _split(self, data: dict):
+        # Converte um data.json único no layout por utilizador
+        next_ids = data.setdefault("next_ids", {})
+        for user in data["users"]:
+            for board in user["boards"]:
+                next_ids["board"] = max(next_ids.get("board", 1), board["id"] + 1)
+                for list in board["lists"]:
+                    next_ids["list"] = max(next_ids.get("list", 1), list["id"] + 1)
+                    for item in list["items"]:
+                        next_ids["item"] = max(next_ids.get("item", 1), item["id"] + 1)
+            payload = snapshot.encode({"boards": user["boards"]}, self.snapshot_format)
+            snapshot.write_atomic(self._shard_path(user["name"]), payload)
+        directory = {k: v for k, v in data.items() if k != "users"}
+        directory["users"] = [
+            {"name": u["name"], "password": u["password"], "board_count": len(u["boards"])}
+            for u in data["users"]
+        ]
+        snapshot.write_atomic(self.filename, snapshot.encode(directory, self.snapshot_format))
+        logger.info("Importados %d usuários de %s para %s", len(data["users"]), self.import_from, self.directory)
+
+    def _load_shard(self, user):
+        if user["name"] in self._loaded:
+            return
+        with self._lock:
+            if user["name"] in self._loaded:
+                return
+            path = self._find_shard(user["name"])
+            boards = snapshot.load(path)["boards"] if path is not None else []
+            user["boards"] = boards
+            self._loaded.add(user["name"])
+            if self._renumber_user_ids(user):
+                self._dirty_shards.add(user["name"])
+            for board in boards:
+                self._index_board(user["name"], board)
+            logger.info("Boards de %s carregados: %d", user["name"], len(boards))
+
+    @instrumentation.traced(category="io")
+    def _save_data(self):
+        with self._write_lock, metrics.STORE_SAVE_SECONDS.time():
+            with self._lock:
+                directory = {k: v for k, v in self.data.items() if k != "users"}
+                directory["users"] = [
+                    {"name": u["name"], "password": u["password"], "board_count": self.get_board_count(u["name"])}
+                    for u in self.data["users"]
+                ]
+                shards = {
+                    name: snapshot.encode({"boards": self._users[name]["boards"]}, self.snapshot_format)
+                    for name in self._dirty_shards
+                    if name in self._users and name in self._loaded
+                }
+                removed = self._removed_shards - set(shards)
+                self._dirty_shards.clear()
+                self._removed_shards.clear()
+                payload = snapshot.encode(directory, self.snapshot_format)
+            for name in removed:
+                for format in SHARD_EXTENSIONS:
+                    if os.path.exists(self._shard_path(name, format)):
+                        os.remove(self._shard_path(name, format))
+                self._shard_bytes.pop(name, None)
+            for name, shard in shards.items():
+                snapshot.write_atomic(self._shard_path(name), shard)
+                self._shard_bytes[name] = len(shard)
+            snapshot.write_atomic(self.filename, payload)
+        # Diretório mais todos os shards, incluindo os que não foram reescritos
+        metrics.STORE_FILE_BYTES.set(len(payload) + sum(self._shard_bytes.values()))
+
+    def _apply(self, record: dict):
+        super()._apply(record)
+        if record["op"] == "add_user":
+            self._loaded.add(record["name"])
+            self._dirty_shards.add(record["name"])
+            self._removed_shards.discard(record["name"])
+        elif record["op"] == "remove_user":
+            self._loaded.discard(record["name"])
+            self._dirty_shards.discard(record["name"])
+            self._removed_shards.add(record["name"])
+        else:
+            self._dirty_shards.add(record["user"])
+
+    def set_current_user(self, user):
+        if user is not None:
+            self._load_shard(user)
+        super().set_current_user(user)
+
+    def _get_current_user(self):
+        user = super()._get_current_user()
+        if user:
+            self._load_shard(user)
+        return user
+
+    def get_board_count(self, name: str) -> int:
+        user = self._users.get(name)
+        if user is None:
+            return 0
+        if name in self._loaded:
+            return len(user["boards"])
+        return user.get("board_count", 0)
@@ -1,5 +1,6 @@
 import flet as ft
-from data_store import DataStore
+from data_store import DataStore, StoreEvent
+import render
 
 class Sidebar(ft.Container):
     def __init__(self, app_layout, store: DataStore):
@@ -7,6 +8,9 @@ class Sidebar(ft.Container):
         self.app_layout = app_layout
         self.page = app_layout.page
         self.nav_rail_visible = True
+        # Destinos do rail de boards indexados pelo id do board
+        self.board_destinations: dict[int, ft.NavigationRailDestination] = {}
+        self.store.add_listener(self.on_store_event)
 
         # Inicializa os itens de navegação
         self.update_nav_items()
@@ -87,30 +91,81 @@ class Sidebar(ft.Container):
                 )
             )
 
+    def board_destination(self, b) -> ft.NavigationRailDestination:
+        return ft.NavigationRailDestination(
+            label_content=ft.TextField(
+                value=b.name,
+                hint_text=b.name,
+                text_size=12,
+                read_only=True,
+                on_focus=self.board_name_focus,
+                on_blur=self.board_name_blur,
+                border=ft.InputBorder.NONE,
+                height=50,
+                width=150,
+                text_align=ft.TextAlign.START,
+                data=b.board_id,
+            ),
+            label=b.name,
+            selected_icon=ft.Icons.CHEVRON_RIGHT_ROUNDED,
+            icon=ft.Icons.CHEVRON_RIGHT_OUTLINED,
+        )
+
+    def rename_board_destination(self, destination: ft.NavigationRailDestination, name: str) -> bool:
+        if destination.label == name:
+            return False
+        destination.label = name
+        destination.label_content.value = name
+        destination.label_content.hint_text = name
+        return True
+
+    def update_board_destinations(self):
+        if self.bottom_nav_rail.page:
+            self.bottom_nav_rail.update()
+
     def sync_board_destinations(self):
-        boards = self.store.get_boards()
-        self.bottom_nav_rail.destinations = [
-            ft.NavigationRailDestination(
-                label_content=ft.TextField(
-                    value=b.name,
-                    hint_text=b.name,
-                    text_size=12,
-                    read_only=True,
-                    on_focus=self.board_name_focus,
-                    on_blur=self.board_name_blur,
-                    border=ft.InputBorder.NONE,
-                    height=50,
-                    width=150,
-                    text_align=ft.TextAlign.START,
-                    data=i,
-                ),
-                label=b.name,
-                selected_icon=ft.Icons.CHEVRON_RIGHT_ROUNDED,
-                icon=ft.Icons.CHEVRON_RIGHT_OUTLINED,
-            )
-            for i, b in enumerate(boards)
-        ]
-        self.update()
+        # Reconcilia os destinos com os boards do store, reaproveitando os
+        # existentes (indexados por id); só atualiza o rail se algo mudou.
+        boards = self.store.get_board_summaries()
+        changed = False
+        destinations = {}
+        for b in boards:
+            destination = self.board_destinations.get(b.board_id)
+            if destination is None:
+                destination = self.board_destination(b)
+                changed = True
+            elif self.rename_board_destination(destination, b.name):
+                changed = True
+            destinations[b.board_id] = destination
+        self.board_destinations = destinations
+        if changed or list(destinations.values()) != self.bottom_nav_rail.destinations:
+            self.bottom_nav_rail.destinations = list(destinations.values())
+            self.update_board_destinations()
+
+    def on_store_event(self, event: StoreEvent):
+        if event.kind == "user" and event.action == "login":
+            # Os destinos são dos boards do utilizador anterior
+            self.board_destinations = {}
+            return
+        user = self.store._get_current_user()
+        if event.kind != "board" or not user or event.user not in (None, user["name"]):
+            return
+        if event.action == "add":
+            b = self.store.get_board_summary(event.board_id)
+            if b is not None and b.board_id not in self.board_destinations:
+                self.board_destinations[b.board_id] = self.board_destination(b)
+                self.bottom_nav_rail.destinations = list(self.board_destinations.values())
+                self.update_board_destinations()
+        elif event.action == "update":
+            destination = self.board_destinations.get(event.board_id)
+            b = self.store.get_board_summary(event.board_id)
+            if destination is not None and b is not None:
+                if self.rename_board_destination(destination, b.name):
+                    self.update_board_destinations()
+        elif event.action == "remove":
+            if self.board_destinations.pop(event.board_id, None) is not None:
+                self.bottom_nav_rail.destinations = list(self.board_destinations.values())
+                self.update_board_destinations()
 
     def toggle_nav_rail(self, e):
         self.visible = not self.visible
@@ -119,17 +174,16 @@ class Sidebar(ft.Container):
     def board_name_focus(self, e):
         e.control.read_only = False
         e.control.border = ft.InputBorder.OUTLINE
-        self.page.update()
+        render.invalidate(self.page, e.control)
 
     def board_name_blur(self, e):
-        board_index = e.control.data
-        new_name = e.control.value
-        board = self.store.get_boards()[board_index]
-        self.store.update_board(board, {"name": new_name})
-        self.app_layout.hydrate_all_boards_view()
+        # A grelha e os destinos são atualizados pelos listeners do store
+        board = self.store.get_board_summary(e.control.data)
         e.control.read_only = True
         e.control.border = ft.InputBorder.NONE
-        self.page.update()
+        if board is not None and e.control.value != board.name:
+            self.store.update_board(board, {"name": e.control.value})
+        e.control.update()
 
     def top_nav_change(self, e):
         index = e.control.selected_index if hasattr(e, "control") else e
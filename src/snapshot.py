@@ -0,0 +1,95 @@
+import json
+import marshal
+import os
+import struct
+import sys
+
+import instrumentation
+import metrics
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Formato binário do ficheiro de dados: MAGIC, versão do formato (1 byte),
+# codec (1 byte) e depois o payload. O codec é msgpack quando está instalado
+# e marshal (stdlib) caso contrário; os ficheiros JSON continuam a ser lidos,
+# o formato é detetado pelo cabeçalho.
+MAGIC = b"TROLLI\x00"
+VERSION = 1
+CODEC_MARSHAL = 0
+CODEC_MSGPACK = 1
+HEADER = struct.Struct("<BB")
+
+FORMATS = ("json", "binary")
+
+
+def is_snapshot(payload: bytes) -> bool:
+    return payload[:len(MAGIC)] == MAGIC
+
+
+def dumps(data: dict) -> bytes:
+    if msgpack is not None:
+        codec, body = CODEC_MSGPACK, msgpack.packb(data, use_bin_type=True)
+    else:
+        # A versão 4 do marshal é estável desde o Python 3.4
+        codec, body = CODEC_MARSHAL, marshal.dumps(data, 4)
+    return MAGIC + HEADER.pack(VERSION, codec) + body
+
+
+def loads(payload: bytes) -> dict:
+    if not is_snapshot(payload):
+        return json.loads(payload)
+    version, codec = HEADER.unpack_from(payload, len(MAGIC))
+    if version != VERSION:
+        raise ValueError(f"Versão de snapshot não suportada: {version}")
+    body = payload[len(MAGIC) + HEADER.size:]
+    if codec == CODEC_MARSHAL:
+        return marshal.loads(body)
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise ValueError("Snapshot gravado com msgpack, que não está instalado (pip install msgpack)")
+        return msgpack.unpackb(body, raw=False)
+    raise ValueError(f"Codec de snapshot desconhecido: {codec}")
+
+
+def encode(data: dict, format: str) -> bytes:
+    if format == "binary":
+        return dumps(data)
+    if format == "json":
+        return json.dumps(data, indent=4).encode("utf-8")
+    raise ValueError(f"Formato desconhecido: {format} (use {', '.join(FORMATS)})")
+
+
+def load(filename: str) -> dict:
+    with open(filename, "rb") as file:
+        return loads(file.read())
+
+
+@instrumentation.traced("snapshot.write_atomic", "io")
+def write_atomic(filename: str, payload: bytes):
+    # Escreve num ficheiro temporário e só depois o troca pelo original: um
+    # crash a meio deixa sempre o ficheiro antigo ou o novo, nunca um misto.
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, "wb") as file:
+        file.write(payload)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_filename, filename)
+    instrumentation.add_bytes("snapshot.write_atomic", len(payload))
+    metrics.STORE_BYTES_WRITTEN.inc(len(payload), kind="snapshot")
+
+
+def convert(source: str, target: str, format: str):
+    write_atomic(target, encode(load(source), format))
+
+
+if __name__ == "__main__":
+    # Conversão entre formatos: python snapshot.py binary data.json data.snapshot
+    #                           python snapshot.py json data.snapshot data.json
+    if len(sys.argv) != 4 or sys.argv[1] not in FORMATS:
+        sys.exit("Uso: python snapshot.py {json|binary} <origem> <destino>")
+    convert(sys.argv[2], sys.argv[3], sys.argv[1])
+    print(f"{sys.argv[2]} ({os.path.getsize(sys.argv[2])} bytes) -> "
+          f"{sys.argv[3]} ({os.path.getsize(sys.argv[3])} bytes)")
@@ -0,0 +1,473 @@
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from board import Board
+    from board_list import BoardList
+    from user import User
+    from item import Item
+
+from data_store import ITEM_FIELDS, BoardSummary, DataStore
+from user import User
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    name TEXT PRIMARY KEY,
+    password TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS boards (
+    pk INTEGER PRIMARY KEY,
+    user TEXT NOT NULL REFERENCES users(name) ON DELETE CASCADE,
+    id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE (user, id)
+);
+CREATE TABLE IF NOT EXISTS lists (
+    pk INTEGER PRIMARY KEY,
+    board_pk INTEGER NOT NULL REFERENCES boards(pk) ON DELETE CASCADE,
+    user TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    color TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS lists_board ON lists (board_pk);
+CREATE INDEX IF NOT EXISTS lists_user_id ON lists (user, id);
+CREATE TABLE IF NOT EXISTS items (
+    pk INTEGER PRIMARY KEY,
+    list_pk INTEGER NOT NULL REFERENCES lists(pk) ON DELETE CASCADE,
+    id INTEGER NOT NULL,
+    item_text TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    tags TEXT NOT NULL DEFAULT '[]',
+    completed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS items_list_id ON items (list_pk, id);
+CREATE TABLE IF NOT EXISTS next_ids (
+    kind TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+ID_TABLES = {"board": "boards", "list": "lists", "item": "items"}
+
+
+class SQLiteStore(DataStore):
+    # Mesma interface (e mesmos dicts) que o JSONStore, mas com escritas por
+    # linha numa base de dados SQLite em modo WAL.
+    def __init__(self, filename="data.db", app=None, page=None, import_from=None):
+        super().__init__()
+        self.filename = filename
+        is_new = not os.path.exists(filename)
+        # Os handlers do Flet correm em threads diferentes
+        self.conn = sqlite3.connect(filename, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.RLock()
+        self._depth = 0
+        self.current_user = None
+        self.app = app
+        self.page = page
+        if is_new and import_from and os.path.exists(import_from):
+            self.import_json(import_from)
+        self.ensure_admin_user()
+
+    @contextmanager
+    def transaction(self):
+        # Transações aninhadas juntam-se à exterior: uma ação de UI que faz
+        # várias mutações resulta num único COMMIT.
+        with self.lock:
+            if self._depth == 0:
+                self.conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.conn.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self.conn.execute("COMMIT")
+
+    def _query(self, sql: str, args=()):
+        with self.lock:
+            return self.conn.execute(sql, args).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def import_json(self, filename: str):
+        with open(filename, "r") as file:
+            data = json.load(file)
+        # Ids repetidos de ficheiros antigos são renumerados a partir do
+        # maior id existente, tal como o JSONStore faz ao carregar
+        next_ids = {kind: 1 for kind in ID_TABLES}
+        next_ids.update(data.get("next_ids", {}))
+        for user in data["users"]:
+            for board in user["boards"]:
+                next_ids["board"] = max(next_ids["board"], board["id"] + 1)
+                for list in board["lists"]:
+                    next_ids["list"] = max(next_ids["list"], list["id"] + 1)
+                    for item in list["items"]:
+                        next_ids["item"] = max(next_ids["item"], item["id"] + 1)
+
+        def unique_id(kind, id, seen):
+            if id in seen:
+                id = next_ids[kind]
+                next_ids[kind] += 1
+            seen.add(id)
+            return id
+
+        with self.transaction():
+            for user in data["users"]:
+                board_ids, list_ids = set(), set()
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO users (name, password) VALUES (?, ?)",
+                    (user["name"], user["password"]),
+                )
+                for board in user["boards"]:
+                    board_pk = self.conn.execute(
+                        "INSERT INTO boards (user, id, name) VALUES (?, ?, ?)",
+                        (user["name"], unique_id("board", board["id"], board_ids), board["name"]),
+                    ).lastrowid
+                    for list in board["lists"]:
+                        list_pk = self.conn.execute(
+                            "INSERT INTO lists (board_pk, user, id, title, color) VALUES (?, ?, ?, ?, ?)",
+                            (board_pk, user["name"], unique_id("list", list["id"], list_ids), list["title"], list["color"]),
+                        ).lastrowid
+                        item_ids = set()
+                        self.conn.executemany(
+                            "INSERT INTO items (list_pk, id, item_text, priority, description, tags, completed) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            [
+                                (
+                                    list_pk,
+                                    unique_id("item", item["id"], item_ids),
+                                    item["item_text"],
+                                    item["priority"],
+                                    item["description"],
+                                    json.dumps(item.get("tags", [])),
+                                    int(item["completed"]),
+                                )
+                                for item in list["items"]
+                            ],
+                        )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO next_ids (kind, value) VALUES (?, ?)", tuple(next_ids.items())
+            )
+        logger.info("Importados %d usuários de %s", len(data["users"]), filename)
+
+    def ensure_admin_user(self):
+        admin_user = self.get_user("admin")
+        if not admin_user:
+            admin_user = User("admin", "admin")
+            self.add_user(admin_user)
+            logger.info("Usuário admin criado com sucesso.")
+
+    def set_current_user(self, user):
+        self.current_user = user
+        if user is not None:
+            logger.info("Usuário definido: %s", user["name"])
+        else:
+            logger.info("Usuário removido (logout)")
+        self._emit("user", "login", user=user["name"] if user else None)
+
+    def _get_current_user(self):
+        if self.current_user:
+            return self.current_user
+        if self.page and self.page.client_storage.get("current_user"):
+            current_user_name = self.page.client_storage.get("current_user")
+            user = self.get_user(current_user_name)
+            if user:
+                self.current_user = user
+                logger.info("Usuário recuperado do client_storage: %s", user["name"])
+                return user
+        return None
+
+    def _board_pk(self, user_name: str, board_id: int):
+        rows = self._query("SELECT pk FROM boards WHERE user = ? AND id = ?", (user_name, board_id))
+        return rows[0]["pk"] if rows else None
+
+    def _find_list(self, user_name: str, list_id: int):
+        rows = self._query(
+            "SELECT l.pk, b.id AS board_id FROM lists l JOIN boards b ON b.pk = l.board_pk "
+            "WHERE l.user = ? AND l.id = ? ORDER BY l.pk LIMIT 1",
+            (user_name, list_id),
+        )
+        return rows[0] if rows else None
+
+    def allocate_id(self, kind: str) -> int:
+        with self.transaction():
+            row = self.conn.execute("SELECT value FROM next_ids WHERE kind = ?", (kind,)).fetchone()
+            if row is None:
+                # Bases criadas antes desta tabela: parte do maior id existente
+                row = self.conn.execute(f"SELECT COALESCE(MAX(id), 0) + 1 AS value FROM {ID_TABLES[kind]}").fetchone()
+            new_id = row["value"]
+            self.conn.execute(
+                "INSERT OR REPLACE INTO next_ids (kind, value) VALUES (?, ?)", (kind, new_id + 1)
+            )
+            return new_id
+
+    def add_board(self, board: "Board"):
+        user = self._get_current_user()
+        if user:
+            with self.transaction():
+                if getattr(board, "board_id", None) is None or self._board_pk(user["name"], board.board_id) is not None:
+                    board.board_id = self.allocate_id("board")
+                logger.debug("Adicionando board '%s' para o usuário '%s'", board.name, user["name"])
+                self.conn.execute(
+                    "INSERT INTO boards (user, id, name) VALUES (?, ?, ?)",
+                    (user["name"], board.board_id, board.name),
+                )
+                self._emit("board", "add", user=user["name"], board_id=board.board_id)
+
+    def get_board(self, id: int):
+        # Só o board aberto constrói a árvore de controlos
+        from board import Board
+
+        user = self._get_current_user()
+        if user:
+            rows = self._query("SELECT id, name FROM boards WHERE user = ? AND id = ?", (user["name"], id))
+            if rows:
+                return Board(
+                    self.app,
+                    self,
+                    rows[0]["name"],
+                    self.page,
+                    board_id=rows[0]["id"],
+                    lists=self.get_lists_by_board(rows[0]["id"])
+                )
+        return None
+
+    def get_boards(self):
+        user = self._get_current_user()
+        if user and self.app and self.page:
+            return [self.get_board(b.board_id) for b in self.get_board_summaries()]
+        return []
+
+    def _summaries(self, where: str, args):
+        rows = self._query(
+            "SELECT b.id, b.name, COUNT(DISTINCT l.pk) AS list_count, COUNT(i.pk) AS item_count "
+            "FROM boards b LEFT JOIN lists l ON l.board_pk = b.pk LEFT JOIN items i ON i.list_pk = l.pk "
+            f"WHERE {where} GROUP BY b.pk ORDER BY b.pk",
+            args,
+        )
+        return [BoardSummary(r["id"], r["name"], r["list_count"], r["item_count"]) for r in rows]
+
+    def get_board_summaries(self):
+        user = self._get_current_user()
+        if user:
+            return self._summaries("b.user = ?", (user["name"],))
+        return []
+
+    def get_board_summary(self, id: int):
+        user = self._get_current_user()
+        if user:
+            summaries = self._summaries("b.user = ? AND b.id = ?", (user["name"], id))
+            if summaries:
+                return summaries[0]
+        return None
+
+    def update_board(self, board: "Board", update: dict):
+        user = self._get_current_user()
+        if user and "name" in update:
+            with self.transaction():
+                self.conn.execute(
+                    "UPDATE boards SET name = ? WHERE user = ? AND id = ?",
+                    (update["name"], user["name"], board.board_id),
+                )
+                self._emit("board", "update", user=user["name"], board_id=board.board_id)
+            board.name = update["name"]
+            logger.debug("Board atualizado: %s", board.name)
+
+    def remove_board(self, board: "Board"):
+        user = self._get_current_user()
+        if user:
+            with self.transaction():
+                self.conn.execute(
+                    "DELETE FROM boards WHERE user = ? AND id = ?", (user["name"], board.board_id)
+                )
+                self._emit("board", "remove", user=user["name"], board_id=board.board_id)
+
+    def add_list(self, board_id: int, list: "BoardList"):
+        user = self._get_current_user()
+        if user:
+            with self.transaction():
+                board_pk = self._board_pk(user["name"], board_id)
+                if board_pk is None:
+                    return
+                exists = self.conn.execute(
+                    "SELECT 1 FROM lists WHERE board_pk = ? AND id = ?", (board_pk, list.board_list_id)
+                ).fetchone()
+                if not exists:
+                    self.conn.execute(
+                        "INSERT INTO lists (board_pk, user, id, title, color) VALUES (?, ?, ?, ?, ?)",
+                        (board_pk, user["name"], list.board_list_id, list.title, list.color),
+                    )
+                    self._emit("list", "add", user=user["name"], board_id=board_id, list_id=list.board_list_id)
+
+    def get_lists_by_board(self, board_id: int):
+        user = self._get_current_user()
+        if user:
+            board_pk = self._board_pk(user["name"], board_id)
+            if board_pk is not None:
+                rows = self._query(
+                    "SELECT id, title, color FROM lists WHERE board_pk = ? ORDER BY pk", (board_pk,)
+                )
+                return [{"id": l["id"], "title": l["title"], "color": l["color"]} for l in rows]
+        return []
+
+    def remove_list(self, board_id: int, list_id: int):
+        user = self._get_current_user()
+        if user:
+            with self.transaction():
+                board_pk = self._board_pk(user["name"], board_id)
+                self.conn.execute("DELETE FROM lists WHERE board_pk = ? AND id = ?", (board_pk, list_id))
+                self._emit("list", "remove", user=user["name"], board_id=board_id, list_id=list_id)
+
+    def add_item(self, list_id: int, item: "Item", index: int | None = None):
+        user = self._get_current_user()
+        if user:
+            with self.transaction():
+                list_row = self._find_list(user["name"], list_id)
+                if list_row is None:
+                    return
+                # Os itens são ordenados por pk: para inserir a meio, os que
+                # ficam depois da posição são reinseridos a seguir ao novo
+                tail_pk = None
+                if index is not None:
+                    row = self.conn.execute(
+                        "SELECT pk FROM items WHERE list_pk = ? ORDER BY pk LIMIT 1 OFFSET ?",
+                        (list_row["pk"], index),
+                    ).fetchone()
+                    tail_pk = row["pk"] if row is not None else None
+                new_pk = self.conn.execute(
+                    "INSERT INTO items (list_pk, id, item_text, priority, description, tags, completed) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        list_row["pk"],
+                        item.item_id,
+                        item.item_text,
+                        item.priority,
+                        item.description,
+                        json.dumps(item.tags),
+                        int(item.completed),
+                    ),
+                ).lastrowid
+                if tail_pk is not None:
+                    tail = (list_row["pk"], tail_pk, new_pk)
+                    self.conn.execute(
+                        "INSERT INTO items (list_pk, id, item_text, priority, description, tags, completed) "
+                        "SELECT list_pk, id, item_text, priority, description, tags, completed FROM items "
+                        "WHERE list_pk = ? AND pk >= ? AND pk < ? ORDER BY pk",
+                        tail,
+                    )
+                    self.conn.execute("DELETE FROM items WHERE list_pk = ? AND pk >= ? AND pk < ?", tail)
+                self._emit("item", "add", user=user["name"], board_id=list_row["board_id"],
+                           list_id=list_id, item_id=item.item_id)
+
+    def get_items(self, list_id: int):
+        user = self._get_current_user()
+        if user:
+            list_row = self._find_list(user["name"], list_id)
+            if list_row is not None:
+                rows = self._query(
+                    "SELECT id, item_text, priority, description, tags, completed "
+                    "FROM items WHERE list_pk = ? ORDER BY pk",
+                    (list_row["pk"],),
+                )
+                return [
+                    {
+                        "id": i["id"],
+                        "item_text": i["item_text"],
+                        "priority": i["priority"],
+                        "description": i["description"],
+                        "tags": json.loads(i["tags"]),
+                        "completed": bool(i["completed"]),
+                    }
+                    for i in rows
+                ]
+        return []
+
+    def update_item(self, list_id: int, item_id: int, fields: dict):
+        user = self._get_current_user()
+        columns = [k for k in fields if k in ITEM_FIELDS]
+        if user and columns:
+            values = [
+                json.dumps(fields[k]) if k == "tags" else int(fields[k]) if k == "completed" else fields[k]
+                for k in columns
+            ]
+            with self.transaction():
+                list_row = self._find_list(user["name"], list_id)
+                if list_row is None:
+                    return
+                self.conn.execute(
+                    f"UPDATE items SET {', '.join(f'{k} = ?' for k in columns)} WHERE list_pk = ? AND id = ?",
+                    (*values, list_row["pk"], item_id),
+                )
+                self._emit("item", "update", user=user["name"], board_id=list_row["board_id"],
+                           list_id=list_id, item_id=item_id)
+
+    def remove_item(self, list_id: int, item_id: int):
+        user = self._get_current_user()
+        if user:
+            with self.transaction():
+                list_row = self._find_list(user["name"], list_id)
+                if list_row is None:
+                    return
+                self.conn.execute("DELETE FROM items WHERE list_pk = ? AND id = ?", (list_row["pk"], item_id))
+                self._emit("item", "remove", user=user["name"], board_id=list_row["board_id"],
+                           list_id=list_id, item_id=item_id)
+
+    def add_user(self, user: "User"):
+        with self.transaction():
+            self.conn.execute(
+                "INSERT OR IGNORE INTO users (name, password) VALUES (?, ?)", (user.name, user.password)
+            )
+            self._emit("user", "add", user=user.name)
+
+    def _user_dict(self, row):
+        boards = self._query("SELECT id, name FROM boards WHERE user = ? ORDER BY pk", (row["name"],))
+        return {
+            "name": row["name"],
+            "password": row["password"],
+            "boards": [{"id": b["id"], "name": b["name"]} for b in boards],
+        }
+
+    def get_board_count(self, name: str) -> int:
+        return self._query("SELECT COUNT(*) AS n FROM boards WHERE user = ?", (name,))[0]["n"]
+
+    def get_users(self):
+        return [self._user_dict(u) for u in self._query("SELECT name, password FROM users ORDER BY rowid")]
+
+    def get_user(self, name: str):
+        rows = self._query("SELECT name, password FROM users WHERE name = ?", (name,))
+        return self._user_dict(rows[0]) if rows else None
+
+    def remove_user(self, name: str):
+        with self.transaction():
+            self.conn.execute("DELETE FROM users WHERE name = ?", (name,))
+            self._emit("user", "remove", user=name)
+
+
+if __name__ == "__main__":
+    # Importação única de um data.json existente: python sqlite_store.py data.json data.db
+    source = sys.argv[1] if len(sys.argv) > 1 else "data.json"
+    target = sys.argv[2] if len(sys.argv) > 2 else "data.db"
+    if os.path.exists(target):
+        sys.exit(f"{target} já existe; remova-o antes de importar.")
+    SQLiteStore(target, import_from=source).close()
@@ -0,0 +1,230 @@
+import logging
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+from data_store import DataStore, StoreEvent
+
+logger = logging.getLogger(__name__)
+
+if TYPE_CHECKING:
+    from board import Board
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+
+class FileLock:
+    # Lock exclusivo entre processos sobre "<ficheiro>.lock": impede que dois
+    # servidores escrevam nos mesmos dados (cada um sobrescreveria o outro).
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.file = None
+
+    def acquire(self):
+        self.file = open(self.filename, "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            elif msvcrt is not None:
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            self.file.close()
+            self.file = None
+            raise RuntimeError(f"Os dados já estão a ser usados por outro processo ({self.filename})")
+
+    def release(self):
+        if self.file is not None:
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            self.file.close()
+            self.file = None
+
+
+class StoreService:
+    # Um único store partilhado por todas as sessões do processo (modo web).
+    # As chamadas das sessões são serializadas por um lock, o que faz do
+    # serviço o único escritor dos ficheiros, e os eventos de cada mutação são
+    # reenviados para as sessões do mesmo utilizador.
+    def __init__(self, backend: DataStore, lock_filename: str | None = None):
+        self.backend = backend
+        self.lock = threading.RLock()
+        self.sessions: weakref.WeakSet["SessionStore"] = weakref.WeakSet()
+        self.file_lock = FileLock(lock_filename) if lock_filename else None
+        if self.file_lock is not None:
+            self.file_lock.acquire()
+        self.backend.add_listener(self._forward)
+
+    def open_session(self, page=None, app=None) -> "SessionStore":
+        session = SessionStore(self, page, app)
+        self.sessions.add(session)
+        return session
+
+    def _forward(self, event: StoreEvent):
+        for session in list(self.sessions):
+            session._deliver(event)
+
+    def close(self):
+        with self.lock:
+            self.backend.close()
+            if self.file_lock is not None:
+                self.file_lock.release()
+
+
+class SessionStore(DataStore):
+    # Vista de uma sessão sobre o StoreService: o utilizador atual, a app e a
+    # página são desta sessão; os dados e a persistência são partilhados.
+    def __init__(self, service: StoreService, page=None, app=None):
+        super().__init__()
+        self.service = service
+        self.backend = service.backend
+        self.page = page
+        self.app = app
+        self.current_user = None
+
+    @property
+    def filename(self):
+        return self.backend.filename
+
+    @contextmanager
+    def _context(self):
+        # Põe o backend no contexto desta sessão durante uma chamada; repõe o
+        # anterior porque os listeners podem chamar outras sessões a meio.
+        with self.service.lock:
+            previous = (self.backend.current_user, self.backend.app, self.backend.page)
+            self.backend.current_user, self.backend.app, self.backend.page = self.current_user, self.app, self.page
+            try:
+                yield self.backend
+            finally:
+                self.backend.current_user, self.backend.app, self.backend.page = previous
+
+    def _call(self, name: str, *args):
+        with self._context() as backend:
+            return getattr(backend, name)(*args)
+
+    def _deliver(self, event: StoreEvent):
+        if event.kind == "user":
+            # O login é emitido só pela própria sessão, em set_current_user
+            if event.action != "login":
+                self._emit(event.kind, event.action, user=event.user)
+            return
+        if self.current_user and event.user == self.current_user["name"]:
+            self._emit(
+                event.kind,
+                event.action,
+                user=event.user,
+                board_id=event.board_id,
+                list_id=event.list_id,
+                item_id=event.item_id,
+            )
+
+    @contextmanager
+    def transaction(self):
+        with self._context() as backend:
+            with backend.transaction():
+                yield
+
+    def flush(self):
+        self._call("flush")
+
+    def close(self):
+        # Fecha só a sessão; os dados pendentes são gravados já
+        self.service.sessions.discard(self)
+        self.flush()
+
+    def set_current_user(self, user):
+        self.current_user = user
+        if user is not None:
+            logger.info("Usuário definido: %s", user["name"])
+        else:
+            logger.info("Usuário removido (logout)")
+        self._emit("user", "login", user=user["name"] if user else None)
+
+    def _get_current_user(self):
+        if self.current_user:
+            return self.current_user
+        if self.page and self.page.client_storage.get("current_user"):
+            user = self.get_user(self.page.client_storage.get("current_user"))
+            if user:
+                self.set_current_user(user)
+                return user
+        return None
+
+    def allocate_id(self, kind: str) -> int:
+        return self._call("allocate_id", kind)
+
+    def add_board(self, board):
+        self._call("add_board", board)
+
+    def get_board(self, id: int) -> "Board | None":
+        # Os controlos são construídos fora do lock e com esta sessão como
+        # store, para que as ações no board passem pelo serviço
+        from board import Board
+
+        summary = self.get_board_summary(id)
+        if summary is None:
+            return None
+        return Board(self.app, self, summary.name, self.page, board_id=summary.board_id)
+
+    def get_boards(self):
+        return [self.get_board(b.board_id) for b in self.get_board_summaries()]
+
+    def get_board_summaries(self):
+        return self._call("get_board_summaries")
+
+    def get_board_summary(self, id: int):
+        return self._call("get_board_summary", id)
+
+    def update_board(self, board, update: dict):
+        self._call("update_board", board, update)
+
+    def remove_board(self, board):
+        self._call("remove_board", board)
+
+    def add_user(self, user):
+        self._call("add_user", user)
+
+    def get_users(self):
+        return self._call("get_users")
+
+    def get_user(self, name: str):
+        return self._call("get_user", name)
+
+    def remove_user(self, name: str):
+        self._call("remove_user", name)
+
+    def get_board_count(self, name: str) -> int:
+        return self._call("get_board_count", name)
+
+    def add_list(self, board_id: int, list):
+        self._call("add_list", board_id, list)
+
+    def get_lists_by_board(self, board_id: int):
+        return self._call("get_lists_by_board", board_id)
+
+    def remove_list(self, board_id: int, list_id: int):
+        self._call("remove_list", board_id, list_id)
+
+    def add_item(self, list_id: int, item, index: int | None = None):
+        self._call("add_item", list_id, item, index)
+
+    def get_items(self, list_id: int):
+        return self._call("get_items", list_id)
+
+    def update_item(self, list_id: int, item_id: int, fields: dict):
+        self._call("update_item", list_id, item_id, fields)
+
+    def remove_item(self, list_id: int, item_id: int):
+        self._call("remove_item", list_id, item_id)
+
+
+def data_lock_filename(store: DataStore) -> str:
+    return f"{os.path.abspath(store.filename)}.lock"
@@ -0,0 +1,265 @@
+import hashlib
+import importlib.metadata
+import json
+import logging
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import instrumentation
+import metrics
+
+# Modelos spaCy por idioma. São carregados apenas quando são precisos (ou em
+# segundo plano por prewarm), nunca durante o import, e nunca descarregados
+# automaticamente: se não estiverem instalados a sugestão de tags fica
+# indisponível.
+MODELS = {
+    "en": "en_core_web_sm",
+    "pt": "pt_core_news_sm",
+}
+
+logger = logging.getLogger(__name__)
+
+_models = {}
+_unavailable = set()
+_signature = None
+_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class SuggestionCache:
+    # Cache LRU persistente de sugestões: chave = hash do texto normalizado e
+    # das versões dos modelos, valor = [idioma, tags]. Cartões inalterados
+    # não voltam a passar pelo langdetect nem pelo spaCy.
+    def __init__(self, filename: str = "tag_cache.json", capacity: int = 5000):
+        self.filename = filename
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._dirty = False
+        self._lock = threading.Lock()
+        if os.path.exists(filename):
+            try:
+                with open(filename, "r", encoding="utf-8") as file:
+                    self._entries.update(json.load(file))
+            except ValueError:
+                logger.warning("Cache de tags inválida ignorada: %s", filename)
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, lang: str, tags: list[str]):
+        with self._lock:
+            self._entries[key] = [lang, tags]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = json.dumps(self._entries, ensure_ascii=False)
+            self._dirty = False
+        tmp_filename = f"{self.filename}.tmp"
+        with open(tmp_filename, "w", encoding="utf-8") as file:
+            file.write(payload)
+        os.replace(tmp_filename, self.filename)
+
+
+_cache = None
+
+
+def configure_cache(filename: str, capacity: int = 5000):
+    global _cache
+    _cache = SuggestionCache(filename, capacity)
+
+
+def get_cache() -> SuggestionCache:
+    global _cache
+    if _cache is None:
+        _cache = SuggestionCache()
+    return _cache
+
+
+def load_model(lang: str):
+    with _lock:
+        if lang in _models:
+            return _models[lang]
+        if lang in _unavailable:
+            return None
+        try:
+            import spacy
+            nlp = spacy.load(MODELS[lang])
+        except (ImportError, OSError):
+            logger.warning("Modelo '%s' indisponível. Instale-o com: python -m spacy download %s", MODELS[lang], MODELS[lang])
+            _unavailable.add(lang)
+            return None
+        _models[lang] = nlp
+        return nlp
+
+
+def get_model(lang: str):
+    # Se o modelo do idioma não existir usa o outro, se estiver instalado
+    nlp = load_model(lang)
+    if nlp is None:
+        for other in MODELS:
+            if other != lang:
+                nlp = load_model(other)
+                if nlp is not None:
+                    break
+    return nlp
+
+
+def prewarm():
+    threading.Thread(target=lambda: [load_model(lang) for lang in MODELS], daemon=True).start()
+
+
+def detect_language(text: str) -> str:
+    try:
+        from langdetect import detect
+        lang = detect(text)
+        if lang.startswith("pt"):
+            return "pt"
+        elif lang.startswith("en"):
+            return "en"
+        else:
+            return "en"
+    except:
+        return "en"
+
+
+def extract_tags(doc) -> list[str]:
+    tags = set()
+    for token in doc:
+        if token.pos_ in ["NOUN", "PROPN"] and not token.is_stop:
+            tags.add(token.text)
+    for ent in doc.ents:
+        tags.add(ent.text.lower())
+    suggested_tags = [tag for tag in tags if len(tag) > 2]
+    return suggested_tags[:5]
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).lower().split())
+
+
+def models_signature() -> str | None:
+    # Muda quando um modelo é atualizado, invalidando as entradas antigas. Usa
+    # as versões dos pacotes instalados: um acerto na cache não carrega
+    # nenhum modelo. Um modelo atualizado só é usado depois de reiniciar, por
+    # isso a assinatura é calculada uma vez.
+    global _signature
+    if _signature is None:
+        versions = []
+        for name in MODELS.values():
+            try:
+                versions.append(f"{name}-{importlib.metadata.version(name)}")
+            except importlib.metadata.PackageNotFoundError:
+                pass
+        _signature = "|".join(versions)
+    return _signature or None
+
+
+def cache_key(text: str, signature: str) -> str:
+    return hashlib.sha1(f"{signature}\n{text}".encode("utf-8")).hexdigest()
+
+
+def suggest_tags(text: str, lang: str | None = None) -> list[str] | None:
+    # Devolve None quando nenhum modelo está disponível
+    text = normalize_text(text)
+    if not text:
+        return []
+    nlp = get_model(lang or detect_language(text))
+    if nlp is None:
+        return None
+    return extract_tags(nlp(text))
+
+
+@instrumentation.traced(category="nlp")
+def analyze(text: str) -> tuple[str, list[str] | None]:
+    # Uma única deteção de idioma, reutilizada pela UI
+    text = normalize_text(text)
+    if not text:
+        return "en", []
+    signature = models_signature()
+    if signature is None:
+        return detect_language(text), None
+    key = cache_key(text, signature)
+    cached = get_cache().get(key)
+    if cached is not None:
+        metrics.TAG_CACHE_LOOKUPS.inc(result="hit")
+        return cached[0], cached[1]
+    metrics.TAG_CACHE_LOOKUPS.inc(result="miss")
+    with metrics.TAG_SUGGESTION_SECONDS.time(mode="single"):
+        lang = detect_language(text)
+        tags = suggest_tags(text, lang)
+    if tags is not None:
+        get_cache().put(key, lang, tags)
+        get_cache().save()
+    return lang, tags
+
+
+@instrumentation.traced(category="nlp")
+def suggest_tags_batch(texts: list[str], batch_size: int = 64) -> list[list[str]] | None:
+    # Agrupa os textos por idioma e passa cada grupo por nlp.pipe, apenas com
+    # os componentes necessários (tagger/morphologizer, attribute_ruler e NER).
+    # Textos já vistos saem da cache. Devolve None quando nenhum modelo está
+    # disponível.
+    signature = models_signature()
+    if signature is None:
+        return None
+    cache = get_cache()
+    results = [[] for _ in texts]
+    keys = {}
+    by_lang = {}
+    for i, text in enumerate(texts):
+        text = normalize_text(text)
+        if not text:
+            continue
+        keys[i] = (cache_key(text, signature), text)
+        cached = cache.get(keys[i][0])
+        metrics.TAG_CACHE_LOOKUPS.inc(result="hit" if cached is not None else "miss")
+        if cached is not None:
+            results[i] = cached[1]
+        else:
+            by_lang.setdefault(detect_language(text), []).append(i)
+    for lang, indices in by_lang.items():
+        nlp = get_model(lang)
+        if nlp is None:
+            # Pacote instalado mas o modelo não carrega (ex.: sem spaCy)
+            cache.save()
+            return None
+        disabled = [name for name in ("parser", "lemmatizer") if name in nlp.pipe_names]
+        with metrics.TAG_SUGGESTION_SECONDS.time(mode="batch"):
+            docs = nlp.pipe((keys[i][1] for i in indices), batch_size=batch_size, disable=disabled)
+            for i, doc in zip(indices, docs):
+                results[i] = extract_tags(doc)
+                cache.put(keys[i][0], lang, results[i])
+    cache.save()
+    return results
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Um só worker: os pipelines spaCy não são usados em paralelo
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tagging")
+        return _executor
+
+
+def submit(text: str) -> Future:
+    # Corre analyze fora da thread do handler do Flet
+    return _get_executor().submit(analyze, text)
+
+
+def submit_batch(texts: list[str]) -> Future:
+    return _get_executor().submit(suggest_tags_batch, texts)